@@ -30,6 +30,7 @@ from typing import List, Mapping
 from typing import Optional, Tuple, Union
 
 from .common import *
+from .fetchers import FetchedContentNotModifiedException
 
 class SchemeHandlerCacheHandler:
     def __init__(self, cacheDir, schemeHandlers:Mapping[str,ProtocolFetcher]):
@@ -39,32 +40,39 @@ class SchemeHandlerCacheHandler:
         # TODO: create caching database
         self.cacheDir = cacheDir
         self.schemeHandlers = {}
-        
+
+        # Directories already known to exist, so no stat or mkdir
+        # system call is paid again for them on each fetch
+        self._assuredDirs = set()
+
+        # Metadata structures already parsed within this process,
+        # keyed by their cached metadata filename
+        self._parsedMetaCache = {}
+
         self.addSchemeHandlers(schemeHandlers)
     
     def addSchemeHandlers(self, schemeHandlers:Mapping[str,ProtocolFetcher]) -> None:
         if isinstance(schemeHandlers, dict):
             self.schemeHandlers.update(schemeHandlers)
-    
-    def fetch(self, remote_file:Union[urllib.parse.ParseResult, URIType], destdir:AbsPath, offline:bool, ignoreCache:bool=False, registerInCache:bool=True, secContext:Optional[SecurityContextConfig]=None) -> Tuple[ContentKind, AbsPath, List[URIWithMetadata]]:
-        # The directory with the content, whose name is based on sha256
-        if not os.path.exists(destdir):
+
+    def _assureDir(self, theDir:AbsPath, purpose:str) -> None:
+        if theDir not in self._assuredDirs:
             try:
-                os.makedirs(destdir)
+                os.makedirs(theDir, exist_ok=True)
             except IOError:
-                errstr = "ERROR: Unable to create directory for workflow inputs {}.".format(destdir)
+                errstr = "ERROR: Unable to create directory for {} {}.".format(purpose, theDir)
                 raise WFException(errstr)
-        
+            self._assuredDirs.add(theDir)
+
+    def fetch(self, remote_file:Union[urllib.parse.ParseResult, URIType], destdir:AbsPath, offline:bool, ignoreCache:bool=False, registerInCache:bool=True, secContext:Optional[SecurityContextConfig]=None) -> Tuple[ContentKind, AbsPath, List[URIWithMetadata]]:
+        # The directory with the content, whose name is based on sha256
+        self._assureDir(destdir, 'workflow inputs')
+
         # The directory where the symlinks derived from SHA1 obtained from URIs
         # to the content are placed
         hashDir = os.path.join(destdir,'uri_hashes')
-        if not os.path.exists(hashDir):
-            try:
-                os.makedirs(hashDir)
-            except IOError:
-                errstr = "ERROR: Unable to create directory for workflow URI hashes {}.".format(hashDir)
-                raise WFException(errstr)
-        
+        self._assureDir(hashDir, 'workflow URI hashes')
+
         # This filename will only be used when content is being fetched
         tempCachedFilename = os.path.join(destdir, 'caching-' + str(uuid.uuid4()))
         # This is an iterative process, where the URI is resolved and peeled until a basic fetching protocol is reached
@@ -85,16 +93,46 @@ class SchemeHandlerCacheHandler:
             
             # TODO: check cached state in future database
             # Cleaning up
+            preservedMetaStructure = None
+            conditionalHeaders = None
             if registerInCache and ignoreCache:
-                # Removing the metadata
-                if os.path.exists(uriMetaCachedFilename):
-                    os.unlink(uriMetaCachedFilename)
-                # Removing the symlink
-                if os.path.exists(uriCachedFilename):
-                    os.unlink(uriCachedFilename)
-                # We cannot remove the content as
-                # it could be referenced by other symlinks
-            
+                # Instead of blindly discarding a still cached copy, the
+                # validators sent by the server on the previous fetch are
+                # gathered, so the fetch below can be made conditional
+                # and a 304 answer reuses the cached content
+                if parsedInputURL.scheme.lower() in ('http', 'https') and os.path.exists(uriMetaCachedFilename) and os.path.exists(uriCachedFilename):
+                    try:
+                        candidateMetaStructure = self._parsedMetaCache.get(uriMetaCachedFilename)
+                        if candidateMetaStructure is None:
+                            with open(uriMetaCachedFilename, mode="r", encoding="utf-8") as mIn:
+                                candidateMetaStructure = json.loads(mIn.read())
+                        if candidateMetaStructure.get('fingerprint') is not None:
+                            lastMetadata = candidateMetaStructure['metadata_array'][-1]['metadata']
+                            conditionalHeaders = {}
+                            if lastMetadata.get('ETag') is not None:
+                                conditionalHeaders['If-None-Match'] = lastMetadata['ETag']
+                            if lastMetadata.get('Last-Modified') is not None:
+                                conditionalHeaders['If-Modified-Since'] = lastMetadata['Last-Modified']
+                            if len(conditionalHeaders) > 0:
+                                preservedMetaStructure = candidateMetaStructure
+                            else:
+                                conditionalHeaders = None
+                    except Exception:
+                        # Unreadable or incomplete metadata, so no revalidation
+                        preservedMetaStructure = None
+                        conditionalHeaders = None
+
+                if preservedMetaStructure is None:
+                    # Removing the metadata
+                    self._parsedMetaCache.pop(uriMetaCachedFilename, None)
+                    if os.path.exists(uriMetaCachedFilename):
+                        os.unlink(uriMetaCachedFilename)
+                    # Removing the symlink
+                    if os.path.exists(uriCachedFilename):
+                        os.unlink(uriCachedFilename)
+                    # We cannot remove the content as
+                    # it could be referenced by other symlinks
+
             if not registerInCache or ignoreCache or not os.path.exists(uriCachedFilename) or not os.path.exists(uriMetaCachedFilename):
                 # As this is a handler for online resources, comply with offline mode
                 if offline:
@@ -108,9 +146,19 @@ class SchemeHandlerCacheHandler:
                     raise WFException('No {} scheme handler for {} (while processing {})'.format(theScheme, the_remote_file, remote_file))
 
                 try:
+                    theSecContext = secContext
+                    if conditionalHeaders is not None:
+                        # The conditional headers are merged into a copy of
+                        # the security context, so the original one is not
+                        # polluted with them
+                        theSecContext = dict(secContext)  if isinstance(secContext, dict)  else  {}
+                        theHeaders = dict(theSecContext.get('headers', {}))
+                        theHeaders.update(conditionalHeaders)
+                        theSecContext['headers'] = theHeaders
+
                     # Content is fetched here
-                    inputKind, fetched_metadata_array = schemeHandler(the_remote_file, tempCachedFilename, secContext=secContext)
-                    
+                    inputKind, fetched_metadata_array = schemeHandler(the_remote_file, tempCachedFilename, secContext=theSecContext)
+
                     fingerprint = None
                     if isinstance(inputKind, ContentKind):
                         if os.path.isfile(tempCachedFilename): # inputKind == ContentKind.File:
@@ -138,7 +186,9 @@ class SchemeHandlerCacheHandler:
                             metaStructure['resolves_to'] = inputKind
                         
                         json.dump(metaStructure, mOut)
-                    
+
+                    self._parsedMetaCache[uriMetaCachedFilename] = metaStructure
+
                     # Now, creating the symlink
                     if fingerprint is not None:
                         finalCachedFilename = os.path.join(destdir, fingerprint)
@@ -155,22 +205,44 @@ class SchemeHandlerCacheHandler:
                     if os.path.lexists(uriCachedFilename):
                         os.unlink(uriCachedFilename)
                     os.symlink(next_input_file, uriCachedFilename)
+                except FetchedContentNotModifiedException as fe:
+                    # The content did not change server side, so the cached
+                    # copy and its metadata are reused, as in a cache hit.
+                    # A 304 can also show up when the conditional headers
+                    # were supplied by the caller or a noncompliant server,
+                    # and then there is no preserved copy to reuse
+                    if preservedMetaStructure is None:
+                        raise WFException("Content from {} was answered as unmodified, but there is no cached copy to reuse (while processing {}): {}".format(the_remote_file, remote_file, fe))
+                    if os.path.exists(tempCachedFilename):
+                        os.unlink(tempCachedFilename)
+                    metaStructure = preservedMetaStructure
+                    self._parsedMetaCache[uriMetaCachedFilename] = metaStructure
+                    inputKind = ContentKind(metaStructure['kind'])
+                    finalCachedFilename = os.path.normpath(os.path.join(hashDir, os.readlink(uriCachedFilename)))
+                    fetched_metadata_array = list(map(lambda m: URIWithMetadata(m['uri'],m['metadata']), metaStructure['metadata_array']))
                 except WFException as we:
                     raise we
                 except Exception as e:
                     raise WFException("Cannot download content from {} to {} (while processing {}) (temp file {}): {}".format(the_remote_file, uriCachedFilename, remote_file, tempCachedFilename, e))
                 
             else:
-                with open(uriMetaCachedFilename, mode="r", encoding="utf-8") as mIn:
-                    # Deserializing the metadata
-                    metaStructure = json.load(mIn)
-                    inputKind = metaStructure.get('kind')
-                    if inputKind is None:
-                        inputKind = metaStructure['resolves_to']
-                    else:
-                        inputKind = ContentKind(inputKind)
-                        finalCachedFilename = os.path.normpath(os.path.join(hashDir, os.readlink(uriCachedFilename)))
-                    fetched_metadata_array = list(map(lambda m: URIWithMetadata(m['uri'],m['metadata']), metaStructure['metadata_array']))
+                # Metadata already deserialized within this process is
+                # reused, skipping both the read and the parse
+                metaStructure = self._parsedMetaCache.get(uriMetaCachedFilename)
+                if metaStructure is None:
+                    with open(uriMetaCachedFilename, mode="r", encoding="utf-8") as mIn:
+                        # Deserializing the metadata
+                        # Slurping and parsing in one go is measurably faster
+                        # than letting json.load pull from the file object
+                        metaStructure = json.loads(mIn.read())
+                    self._parsedMetaCache[uriMetaCachedFilename] = metaStructure
+                inputKind = metaStructure.get('kind')
+                if inputKind is None:
+                    inputKind = metaStructure['resolves_to']
+                else:
+                    inputKind = ContentKind(inputKind)
+                    finalCachedFilename = os.path.normpath(os.path.join(hashDir, os.readlink(uriCachedFilename)))
+                fetched_metadata_array = list(map(lambda m: URIWithMetadata(m['uri'],m['metadata']), metaStructure['metadata_array']))
             
             # Store the metadata
             metadata_array.extend(fetched_metadata_array)
@@ -19,8 +19,8 @@ from __future__ import absolute_import
 
 import abc
 import base64
+import concurrent.futures
 import enum
-import functools
 import hashlib
 import os
 from typing import Any, Callable, List, Mapping, NamedTuple
@@ -30,16 +30,42 @@ from typing import NewType, Optional, Pattern, Tuple, Type, Union
 
 # Patching default context in order to load CA certificates from certifi
 import certifi
+import platform
 import ssl
 
+# The default augmented context is built at most once, as each build
+# re-parses the whole certifi CA bundle
+_default_augmented_context = None
+
 def create_augmented_context(purpose=ssl.Purpose.SERVER_AUTH, *, cafile=None, capath=None, cadata=None):
+    global _default_augmented_context
+
+    isDefault = (purpose == ssl.Purpose.SERVER_AUTH) and (cafile is None) and (capath is None) and (cadata is None)
+    if isDefault and (_default_augmented_context is not None):
+        return _default_augmented_context
+
     context = ssl.create_default_context(purpose=purpose, cafile=cafile, capath=capath, cadata=cadata)
-    
+
     context.load_verify_locations(cafile=certifi.where())
-    
+
+    if isDefault:
+        _default_augmented_context = context
+
     return context
 
-if ssl._create_default_https_context != create_augmented_context:
+def _needs_augmented_context() -> bool:
+    """
+    The certifi CA bundle is only needed where the default verify
+    paths are unusable, which happens on Darwin python.org builds
+    and on installations without system CA certificates
+    """
+    if platform.system() == 'Darwin':
+        return True
+
+    defaults = ssl.get_default_verify_paths()
+    return (defaults.cafile is None) and (defaults.capath is None)
+
+if _needs_augmented_context() and ssl._create_default_https_context != create_augmented_context:
     ssl._create_default_https_context = create_augmented_context
 
 
@@ -332,7 +358,9 @@ class WFException(Exception):
 
 # Next methods have been borrowed from FlowMaps
 DEFAULT_DIGEST_ALGORITHM = 'sha256'
-DEFAULT_DIGEST_BUFFER_SIZE = 65536
+# 1 MiB reads keep the OpenSSL digest code fed with large buffers,
+# instead of paying one syscall per few KiB
+DEFAULT_DIGEST_BUFFER_SIZE = 1024 * 1024
 
 def stringifyDigest(digestAlgorithm, digest:bytes) -> Union[Fingerprint, bytes]:
     return '{0}={1}'.format(digestAlgorithm, str(base64.standard_b64encode(digest), 'iso-8859-1'))
@@ -352,6 +380,16 @@ def ComputeDigestFromFileLike(filelike, digestAlgorithm=DEFAULT_DIGEST_ALGORITHM
     """
     Accessory method used to compute the digest of an input file-like object
     """
+    if hasattr(hashlib, 'file_digest'):
+        # Python 3.11 runs the whole read/update loop in C, releasing
+        # the GIL, when the file-like exposes a real file descriptor
+        try:
+            h = hashlib.file_digest(filelike, digestAlgorithm)
+            return repMethod(digestAlgorithm, h.digest())
+        except (AttributeError, OSError, ValueError):
+            # Not a plain binary file-like, falling back to the loop
+            pass
+
     h = hashlib.new(digestAlgorithm)
     buf = filelike.read(bufferSize)
     while len(buf) > 0:
@@ -361,50 +399,79 @@ def ComputeDigestFromFileLike(filelike, digestAlgorithm=DEFAULT_DIGEST_ALGORITHM
     return repMethod(digestAlgorithm, h.digest())
 
 
-@functools.lru_cache(maxsize=32)
-def ComputeDigestFromFile(filename: Union[AbsPath, RelPath], digestAlgorithm=DEFAULT_DIGEST_ALGORITHM, bufferSize: int = DEFAULT_DIGEST_BUFFER_SIZE, repMethod=stringifyDigest) -> Fingerprint:
+# Raw digests of already hashed contents, keyed by the stat identity
+# of the file, so the very same bytes are never read twice within a
+# process and all the digest representations share a single pass
+_computed_digests = {}
+
+def ComputeDigestFromFile(filename: Union[AbsPath, RelPath], digestAlgorithm=DEFAULT_DIGEST_ALGORITHM, bufferSize: int = DEFAULT_DIGEST_BUFFER_SIZE, repMethod=stringifyDigest, statResult: Optional[os.stat_result] = None) -> Fingerprint:
     """
     Accessory method used to compute the digest of an input file
+
+    :param statResult: an already obtained stat of the file, so no
+    additional stat syscall is spent on the cache key
     """
-    with open(filename, mode='rb') as f:
-        return ComputeDigestFromFileLike(f, digestAlgorithm, bufferSize, repMethod)
+    fStat = os.stat(filename)  if statResult is None  else  statResult
+    cacheKey = (fStat.st_dev, fStat.st_ino, fStat.st_size, fStat.st_mtime_ns, digestAlgorithm)
+    digest = _computed_digests.get(cacheKey)
+    if digest is None:
+        with open(filename, mode='rb') as f:
+            digest = ComputeDigestFromFileLike(f, digestAlgorithm, bufferSize, nullProcessDigest)
+        _computed_digests[cacheKey] = digest
 
-def scantree(path):
-    """Recursively yield DirEntry objects for given directory."""
-
-    hasDirs = False
-    for entry in os.scandir(path):
-        # We are avoiding to enter in loops around '.' and '..'
-        if entry.is_dir(follow_symlinks=False):
-            if entry.name[0] != '.':
-                hasDirs = True
-        else:
-            yield entry
+    return repMethod(digestAlgorithm, digest)
 
-    # We are leaving the dirs to the end
-    if hasDirs:
-        for entry in os.scandir(path):
+def scantree(path):
+    """Iteratively yield DirEntry objects for given directory."""
+
+    # An explicit stack of directories pending to be scanned replaces
+    # the previous recursion, so deep trees neither pay a Python call
+    # per directory nor risk hitting the recursion limit
+    pending = [ path ]
+    while len(pending) > 0:
+        thePath = pending.pop()
+        subDirs = []
+        for entry in os.scandir(thePath):
             # We are avoiding to enter in loops around '.' and '..'
-            if entry.is_dir(follow_symlinks=False) and entry.name[0] != '.':
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name[0] != '.':
+                    subDirs.append(entry)
+            else:
                 yield entry
-                yield from scantree(entry.path)
+
+        # We are leaving the dirs to the end
+        for entry in subDirs:
+            yield entry
+            pending.append(entry.path)
+
+# Maximum number of concurrent file digests within a directory
+MAX_DIGEST_WORKERS = 8
 
 def ComputeDigestFromDirectory(dirname: Union[AbsPath, RelPath], digestAlgorithm=DEFAULT_DIGEST_ALGORITHM, bufferSize: int = DEFAULT_DIGEST_BUFFER_SIZE, repMethod=stringifyDigest) -> Fingerprint:
     """
     Accessory method used to compute the digest of an input directory,
     based on the names and digest of the files in the directory
     """
-    cEntries = [ ]
-    # First, gather and compute all the files
-    for entry in scantree(dirname):
-        if entry.is_file():
-            cEntries.append(
-                (
-                    os.path.relpath(entry.path, dirname).encode('utf-8'),
-                    ComputeDigestFromFile(entry.path, repMethod=nullProcessDigest)
-                )
-            )
-    
+    # First, gather all the files; the DirEntry stat comes from the
+    # scandir cache, saving one stat syscall per file later on
+    fileEntries = [ (entry.path, entry.stat()) for entry in scantree(dirname) if entry.is_file() ]
+
+    def digestOneFile(fileEntry):
+        filePath , fileStat = fileEntry
+        return (
+            os.path.relpath(filePath, dirname).encode('utf-8'),
+            ComputeDigestFromFile(filePath, repMethod=nullProcessDigest, statResult=fileStat)
+        )
+
+    # Then, digest them; hashlib releases the GIL while it chews on
+    # each buffer, so the reads and digests of independent files can
+    # overlap in a thread pool
+    if len(fileEntries) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(fileEntries), MAX_DIGEST_WORKERS)) as executor:
+            cEntries = list(executor.map(digestOneFile, fileEntries))
+    else:
+        cEntries = list(map(digestOneFile, fileEntries))
+
     # Second, sort by the relative path, bytes encoded in utf-8
     cEntries.sort(key=lambda e: e[0])
     
@@ -419,30 +486,52 @@ def ComputeDigestFromDirectory(dirname: Union[AbsPath, RelPath], digestAlgorithm
 def GetGeneratedDirectoryContent(thePath: AbsPath, uri: URIType = None, preferredFilename: RelPath = None) -> GeneratedDirectoryContent:
     """
     """
-    theValues = []
-    with os.scandir(thePath) as itEntries:
-        for entry in itEntries:
-            # Hidden files are skipped by default
-            if not entry.name.startswith('.'):
-                theValue = None
-                if entry.is_file():
-                    theValue = GeneratedContent(
-                        local=entry.path,
-                        # uri=None, 
-                        signature=ComputeDigestFromFile(entry.path, repMethod=nihDigest)
+    # First, the tree is discovered iteratively, keeping the scandir
+    # order of each directory, so deep output trees do not pay one
+    # Python recursion per subdirectory
+    discovered = []
+    pending = [ thePath ]
+    while len(pending) > 0:
+        dirPath = pending.pop()
+        dirEntries = []
+        with os.scandir(dirPath) as itEntries:
+            for entry in itEntries:
+                # Hidden files are skipped by default
+                if not entry.name.startswith('.'):
+                    if entry.is_file():
+                        dirEntries.append((entry.path, True))
+                    elif entry.is_dir():
+                        dirEntries.append((entry.path, False))
+                        pending.append(entry.path)
+        discovered.append((dirPath, dirEntries))
+
+    # Then, contents are assembled bottom-up; as every directory is
+    # discovered after its parent, the reversed order guarantees the
+    # subdirectories are already built when their parent needs them
+    assembled = {}
+    for dirPath, dirEntries in reversed(discovered):
+        theValues = []
+        for entryPath, isFile in dirEntries:
+            if isFile:
+                theValues.append(
+                    GeneratedContent(
+                        local=entryPath,
+                        # uri=None,
+                        signature=ComputeDigestFromFile(entryPath, repMethod=nihDigest)
                     )
-                elif entry.is_dir():
-                    theValue = GetGeneratedDirectoryContent(entry.path)
-
-                if theValue is not None:
-                    theValues.append(theValue)
-
-    return GeneratedDirectoryContent(
-        local=thePath,
-        uri=uri,
-        preferredFilename=preferredFilename,
-        values=theValues
-    )
+                )
+            else:
+                theValues.append(assembled.pop(entryPath))
+
+        isRoot = dirPath == thePath
+        assembled[dirPath] = GeneratedDirectoryContent(
+            local=dirPath,
+            uri=uri  if isRoot  else  None,
+            preferredFilename=preferredFilename  if isRoot  else  None,
+            values=theValues
+        )
+
+    return assembled[thePath]
 
 
 CWLClass2WfExS = {
@@ -18,13 +18,10 @@ from __future__ import absolute_import
 
 import os
 import tempfile
-import atexit
-import shutil
 import abc
 import logging
 
 from typing import Dict, List, Tuple
-from collections import namedtuple
 
 from .common import *
 
@@ -49,30 +46,37 @@ class ContainerFactory(abc.ABC):
         # Getting a logger focused on specific classes
         self.logger = logging.getLogger(self.__class__.__name__)
         
-        # cacheDir 
+        # Factories which do not materialize anything, like the
+        # "no container" one, should not pay the directory setup
+        needsCache = self.NeedsContainersCache()
+
+        # cacheDir
         if cacheDir is None:
             cacheDir = local_config.get('cacheDir')
             if cacheDir:
-                os.makedirs(cacheDir, exist_ok=True)
-            else:
-                cacheDir = tempfile.mkdtemp(prefix='wfexs', suffix='backend')
-                # Assuring this temporal directory is removed at the end
-                atexit.register(shutil.rmtree, cacheDir)
-        
-        if tempDir is None:
-            tempDir = tempfile.mkdtemp(prefix='WfExS-container', suffix='tempdir')
-            # Assuring this temporal directory is removed at the end
-            atexit.register(shutil.rmtree, tempDir)
-        
+                if needsCache:
+                    os.makedirs(cacheDir, exist_ok=True)
+            elif needsCache:
+                # The temporary directory is removed when this factory is
+                # garbage collected, instead of being synchronously walked
+                # through atexit at interpreter shutdown
+                self._cacheDirObj = tempfile.TemporaryDirectory(prefix='wfexs', suffix='backend')
+                cacheDir = self._cacheDirObj.name
+
+        if tempDir is None and needsCache:
+            self._tempDirObj = tempfile.TemporaryDirectory(prefix='WfExS-container', suffix='tempdir')
+            tempDir = self._tempDirObj.name
+
         # This directory might be needed by temporary processes, like
         # image materialization in singularity or podman
         self.tempDir = tempDir
         # But, for materialized containers, we should use common directories
         # This for the containers themselves
-        self.containersCacheDir = os.path.join(cacheDir, 'containers', self.__class__.__name__)
+        self.containersCacheDir = os.path.join(cacheDir, 'containers', self.__class__.__name__)  if cacheDir is not None  else  None
         # This for the symlinks to the containers, following the engine convention
-        self.engineContainersSymlinkDir = os.path.join(self.containersCacheDir, engine_name)
-        os.makedirs(self.engineContainersSymlinkDir, exist_ok=True)
+        self.engineContainersSymlinkDir = os.path.join(self.containersCacheDir, engine_name)  if self.containersCacheDir is not None  else  None
+        if needsCache:
+            os.makedirs(self.engineContainersSymlinkDir, exist_ok=True)
         
         # This variable contains the dictionary of set up environment
         # variables needed to run the tool with the proper setup
@@ -99,7 +103,15 @@ class ContainerFactory(abc.ABC):
     @abc.abstractmethod
     def ContainerType(cls) -> ContainerType:
         pass
-    
+
+    @classmethod
+    def NeedsContainersCache(cls) -> bool:
+        """
+        Whether this factory stores materialized containers, so the
+        cache and temporary directories have to be set up
+        """
+        return True
+
     @property
     def environment(self) -> Dict[str, str]:
         return self._environment
@@ -145,7 +157,15 @@ class NoContainerFactory(ContainerFactory):
     @classmethod
     def ContainerType(cls) -> ContainerType:
         return ContainerType.NoContainer
-    
+
+    @classmethod
+    def NeedsContainersCache(cls) -> bool:
+        """
+        No containers are ever materialized, so no cache directory
+        or temporary directory have to be created
+        """
+        return False
+
     def materializeContainers(self, tagList: List[ContainerTaggedName], simpleFileNameMethod: ContainerFileNamingMethod, offline: bool = False) -> List[Container]:
         """
         It is assured the no-containers are materialized
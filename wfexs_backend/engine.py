@@ -29,35 +29,33 @@ import logging
 from .common import *
 
 from typing import Any, Dict, List, Set, Tuple
-from collections import namedtuple
 
 from .container import Container, ContainerFactory, NoContainerFactory
 from .singularity_container import SingularityContainerFactory
 from .docker_container import DockerContainerFactory
 from .podman_container import PodmanContainerFactory
 
-from rocrate.rocrate import ROCrate
-from rocrate.model.computerlanguage import ComputerLanguage
-
 # Constants
-WORKDIR_INPUTS_RELDIR = 'inputs'
-WORKDIR_INTERMEDIATE_RELDIR = 'intermediate'
-WORKDIR_META_RELDIR = 'meta'
-WORKDIR_STATS_RELDIR = 'stats'
-WORKDIR_OUTPUTS_RELDIR = 'outputs'
-WORKDIR_ENGINE_TWEAKS_RELDIR = 'engineTweaks'
-
-WORKDIR_STDOUT_FILE = 'stdout.txt'
-WORKDIR_STDERR_FILE = 'stderr.txt'
-
-WORKDIR_WORKFLOW_META_FILE = 'workflow_meta.yaml'
-WORKDIR_SECURITY_CONTEXT_FILE = 'credentials.yaml'
-WORKDIR_MARSHALLED_STAGE_FILE = 'stage-state.yaml'
-WORKDIR_MARSHALLED_EXECUTE_FILE = 'execution-state.yaml'
-WORKDIR_MARSHALLED_EXPORT_FILE = 'export-state.yaml'
-WORKDIR_PASSPHRASE_FILE = '.passphrase'
-
-STATS_DAG_DOT_FILE = 'dag.dot'
+# These are interned, as they are reused on uncountable path joins
+# and dict lookups, making the equality checks pointer comparisons
+WORKDIR_INPUTS_RELDIR = sys.intern('inputs')
+WORKDIR_INTERMEDIATE_RELDIR = sys.intern('intermediate')
+WORKDIR_META_RELDIR = sys.intern('meta')
+WORKDIR_STATS_RELDIR = sys.intern('stats')
+WORKDIR_OUTPUTS_RELDIR = sys.intern('outputs')
+WORKDIR_ENGINE_TWEAKS_RELDIR = sys.intern('engineTweaks')
+
+WORKDIR_STDOUT_FILE = sys.intern('stdout.txt')
+WORKDIR_STDERR_FILE = sys.intern('stderr.txt')
+
+WORKDIR_WORKFLOW_META_FILE = sys.intern('workflow_meta.yaml')
+WORKDIR_SECURITY_CONTEXT_FILE = sys.intern('credentials.yaml')
+WORKDIR_MARSHALLED_STAGE_FILE = sys.intern('stage-state.yaml')
+WORKDIR_MARSHALLED_EXECUTE_FILE = sys.intern('execution-state.yaml')
+WORKDIR_MARSHALLED_EXPORT_FILE = sys.intern('export-state.yaml')
+WORKDIR_PASSPHRASE_FILE = sys.intern('.passphrase')
+
+STATS_DAG_DOT_FILE = sys.intern('dag.dot')
 
 class WorkflowEngineException(Exception):
     """
@@ -73,6 +71,12 @@ CONTAINER_FACTORY_CLASSES = [
     NoContainerFactory,
 ]
 
+# Direct lookup by container type, instead of a linear scan over the classes
+CONTAINER_FACTORY_BY_TYPE = {
+    containerFactory.ContainerType(): containerFactory
+    for containerFactory in CONTAINER_FACTORY_CLASSES
+}
+
 
 class WorkflowEngine(AbstractWorkflowEngineType):
     def __init__(self,
@@ -228,18 +232,17 @@ class WorkflowEngine(AbstractWorkflowEngineType):
         if secure_exec and not self.supportsSecureExecContainerType(container_type):
             raise WorkflowEngineException(f"Due technical limitations, secure or paranoid executions are incompatible with {container_type}")
 
-        for containerFactory in CONTAINER_FACTORY_CLASSES:
-            if containerFactory.ContainerType() == container_type:
-                self.logger.debug(f"Container type {container_type}")
-                self.container_factory = containerFactory(
-                    cacheDir=cacheDir,
-                    local_config=local_config,
-                    engine_name=self.__class__.__name__,
-                    tempDir=self.tempDir
-                )
-                break
-        else:
+        containerFactory = CONTAINER_FACTORY_BY_TYPE.get(container_type)
+        if containerFactory is None:
             raise WorkflowEngineException("FATAL: No container factory implementation for {}".format(container_type))
+
+        self.logger.debug(f"Container type {container_type}")
+        self.container_factory = containerFactory(
+            cacheDir=cacheDir,
+            local_config=local_config,
+            engine_name=self.__class__.__name__,
+            tempDir=self.tempDir
+        )
         
         isUserNS = self.container_factory.supportsFeature('userns')
         self.logger.debug(f"Flags: secure => {secure_exec} , userns => {isUserNS} , allowOther => {allowOther}")
@@ -286,7 +289,7 @@ class WorkflowEngine(AbstractWorkflowEngineType):
     def supportsSecureExecContainerType(self, containerType : ContainerType) -> bool:
         return containerType in self.SupportedSecureExecContainerTypes()
     
-    def getEmptyCrateAndComputerLanguage(self, langVersion: WFLangVersion) -> ComputerLanguage:
+    def getEmptyCrateAndComputerLanguage(self, langVersion: WFLangVersion) -> 'ComputerLanguage':
         """
         Due the internal synergies between an instance of ComputerLanguage
         and the RO-Crate it is attached to, both of them should be created
@@ -294,6 +297,11 @@ class WorkflowEngine(AbstractWorkflowEngineType):
         """
         
         wfType = self.workflowType
+        # Deferred imports, as the rocrate dependency tree is heavy
+        # and only the research object workpaths need it
+        from rocrate.rocrate import ROCrate
+        from rocrate.model.computerlanguage import ComputerLanguage
+
         crate = ROCrate()
         compLang = ComputerLanguage(crate, identifier=wfType.rocrate_programming_language, properties={
             "name": wfType.name,
@@ -374,7 +382,11 @@ class WorkflowEngine(AbstractWorkflowEngineType):
         pass
     
     def materializeContainers(self, listOfContainerTags: List[ContainerTaggedName], offline: bool = False) -> List[Container]:
-        return self.container_factory.materializeContainers(listOfContainerTags, self.simpleContainerFileName, offline=offline)
+        # Workflows can declare the very same container in several steps,
+        # so duplicated tags are dropped (preserving the order) before
+        # the factory pays a pull for each one of them
+        uniqueContainerTags = list(dict.fromkeys(listOfContainerTags))
+        return self.container_factory.materializeContainers(uniqueContainerTags, self.simpleContainerFileName, offline=offline)
 
     @abc.abstractmethod
     def launchWorkflow(self, matWfEng: MaterializedWorkflowEngine, inputs: List[MaterializedInput],
@@ -17,88 +17,92 @@
 
 from __future__ import absolute_import
 
-import http.client
 import io
 import os
 import paramiko
 import paramiko.pkey
 from paramiko.config import SSH_PORT as DEFAULT_SSH_PORT
 
+import requests
 import shutil
 import stat
 
 from typing import Any, List, Optional, Tuple, Union
 
-from urllib import request, parse
-import urllib.error
+from urllib import parse
 
 from ..common import *
 from ..utils.ftp_downloader import FTPDownloader
 
+# The size of the chunks being written to the downloaded copy.
+# 1 MiB amortizes both the read and write syscall cost, compared
+# to the default 8 KiB buffering
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class FetchedContentNotModifiedException(WFException):
+    """
+    Raised when a conditional fetch got a 304 Not Modified answer,
+    meaning the already cached copy is still valid
+    """
+    pass
+
+# A module-wide session, so the HTTP(S) connections to the very same
+# servers are pooled and reused along the different fetches
+_http_session = requests.Session()
+
 
 def fetchClassicURL(remote_file:URIType, cachedFilename:Union[AbsPath, io.BytesIO], secContext:Optional[SecurityContextConfig]=None) -> Tuple[Union[URIType, ContentKind], List[URIWithMetadata]]:
     """
-    Method to fetch contents from http, https and ftp
+    Method to fetch contents from http and https
 
     :param remote_file:
     :param cachedFilename:
     :param secContext:
     """
-    
+
     headers = {}
-    method = None
-    orig_remote_file = remote_file
+    method = 'GET'
+    auth = None
     if isinstance(secContext, dict):
         username = secContext.get('username')
         password = secContext.get('password')
         if username is not None:
             if password is None:
                 password = ''
-
-            # Time to set up user and password in URL
-            parsedInputURL = parse.urlparse(remote_file)
-
-            netloc = parse.quote(username, safe='') + ':' + parse.quote(password,
-                                                                        safe='') + '@' + parsedInputURL.hostname
-            if parsedInputURL.port is not None:
-                netloc += ':' + str(parsedInputURL.port)
-
-            # Now the credentials are properly set up
-            remote_file = parse.urlunparse((parsedInputURL.scheme, netloc, parsedInputURL.path,
-                                            parsedInputURL.params, parsedInputURL.query, parsedInputURL.fragment))
-        method = secContext.get('method')
+            auth = (username, password)
+        if secContext.get('method') is not None:
+            method = secContext['method']
         headers = secContext.get('headers', {})
-    
+
     # Preparing where it is going to be written
-    if isinstance(cachedFilename, (io.TextIOBase, io.BufferedIOBase, io.RawIOBase, io.IOBase)):
+    if isinstance(cachedFilename, io.IOBase):
         download_file = cachedFilename
     else:
-        download_file = open(cachedFilename, 'wb')
-    
+        download_file = open(cachedFilename, 'wb', buffering=DOWNLOAD_CHUNK_SIZE)
+
     uri_with_metadata = None
     try:
-        req_remote = request.Request(remote_file, headers=headers, method=method)
-        with request.urlopen(req_remote) as url_response:
-            
+        with _http_session.request(method, remote_file, headers=headers, auth=auth, stream=True) as url_response:
+            # This only happens when the caller sent along conditional
+            # headers, like If-None-Match or If-Modified-Since
+            if url_response.status_code == 304:
+                raise FetchedContentNotModifiedException("Content at {} was not modified".format(remote_file))
+            if url_response.status_code >= 400:
+                raise WFException("Error fetching {} : {} {}".format(remote_file, url_response.status_code, url_response.reason))
+
             uri_with_metadata = URIWithMetadata(url_response.url, dict(url_response.headers.items()))
-            
-            while True:
-                try:
-                    # Try getting it
-                    shutil.copyfileobj(url_response, download_file)
-                except http.client.IncompleteRead as icread:
-                    download_file.write(icread.partial)
-                    # Restarting the copy
-                    continue
-                break
-            
-    except urllib.error.HTTPError as he:
-        raise WFException("Error fetching {} : {} {}".format(orig_remote_file, he.code, he.reason))
+
+            # The response is streamed in chunks, so the whole
+            # content is never hold in memory
+            for chunk in url_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                download_file.write(chunk)
+
     finally:
         # Closing files opened by this code
         if download_file != cachedFilename:
             download_file.close()
-    
+
     return ContentKind.File, [ uri_with_metadata ]
 
 def fetchFTPURL(remote_file:URIType, cachedFilename:AbsPath, secContext:Optional[SecurityContextConfig]=None) -> Tuple[Union[URIType, ContentKind], List[URIWithMetadata]]:
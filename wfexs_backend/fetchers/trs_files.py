@@ -17,13 +17,13 @@
 
 from __future__ import absolute_import
 
+import concurrent.futures
 import io
 import json
 
 from typing import List, Optional, Tuple
 
-from urllib import request, parse
-import urllib.error
+from urllib import parse
 
 from . import fetchClassicURL
 from ..common import *
@@ -34,6 +34,12 @@ INTERNAL_TRS_SCHEME_PREFIX = 'wfexs.trs.files'
 TRS_FILES_SUFFIX = '/files'
 TRS_DESCRIPTOR_INFIX = '/descriptor/'
 
+# Maximum number of concurrent fetches of the files of a tool
+MAX_TRS_FETCH_WORKERS = 8
+
+# Shared by all the raw content fetches, instead of being rebuilt per file
+PLAIN_CONTENT_SEC_CONTEXT = {'headers': {'Accept': 'text/plain'}}
+
 def fetchTRSFiles(remote_file:URIType, cachedFilename:AbsPath, secContext:Optional[SecurityContextConfig]=None) -> Tuple[Union[URIType, ContentKind], List[URIWithMetadata]]:
     """
     Method to download contents from TRS files related to a tool
@@ -46,11 +52,15 @@ def fetchTRSFiles(remote_file:URIType, cachedFilename:AbsPath, secContext:Option
     parsedInputURL = parse.urlparse(remote_file)
     embedded_remote_file = parsedInputURL.path
     
-    if not embedded_remote_file.endswith(TRS_FILES_SUFFIX):
-        metadata_url = embedded_remote_file + TRS_FILES_SUFFIX
-    else:
+    # Both URL templates are derived once here, so each per-file fetch
+    # below is a plain concatenation
+    if embedded_remote_file.endswith(TRS_FILES_SUFFIX):
         metadata_url = embedded_remote_file
-        descriptor_base_url = embedded_remote_file[0:-len(TRS_FILES_SUFFIX)] + TRS_DESCRIPTOR_INFIX
+        descriptor_prefix = embedded_remote_file[0:-len(TRS_FILES_SUFFIX)]
+    else:
+        metadata_url = embedded_remote_file + TRS_FILES_SUFFIX
+        descriptor_prefix = embedded_remote_file
+    descriptor_base_url = descriptor_prefix + TRS_DESCRIPTOR_INFIX
     
     topMeta = {
         'fetched': metadata_url,
@@ -68,20 +78,24 @@ def fetchTRSFiles(remote_file:URIType, cachedFilename:AbsPath, secContext:Option
         metadata_array.extend(metametaio)
         
         metaio = None
-    except urllib.error.HTTPError as he:
-        raise WFException("Error fetching or processing TRS files metadata for {} : {} {}".format(remote_file, he.code, he.reason))
+    except WFException as wfe:
+        raise WFException("Error fetching or processing TRS files metadata for {} : {}".format(remote_file, wfe))
     
     os.makedirs(cachedFilename, exist_ok=True)
     absdirs = set()
     emptyWorkflow = True
+
+    # First pass, gather the files to be fetched, assuring the
+    # intermediate directories are created beforehand
+    fetchTasks = []
     for file_desc in metadata:
         file_rel_path = file_desc.get('path')
         if file_rel_path is not None:
             emptyWorkflow = False
-            
+
             file_url = descriptor_base_url + file_rel_path
             absfile = os.path.join(cachedFilename, file_rel_path)
-            
+
             # Intermediate path creation
             reldir = os.path.dirname(file_rel_path)
             if len(reldir) > 0:
@@ -89,25 +103,42 @@ def fetchTRSFiles(remote_file:URIType, cachedFilename:AbsPath, secContext:Option
                 if absdir not in absdirs:
                     absdirs.add(absdir)
                     os.makedirs(absdir, exist_ok=True)
-            
-            # it is fetched twice, one for the metadata,
-            if file_desc.get('file_type') == 'PRIMARY_DESCRIPTOR':
-                descriptorMeta = io.BytesIO()
-                _ , metaprimary = fetchClassicURL(file_url, descriptorMeta)
-                metadata_array.extend(metaprimary)
-                
-                # This metadata can help a lot to get the workflow repo
-                metadataPD = json.loads(descriptorMeta.getvalue().decode('utf-8'))
-                topMeta['workflow_entrypoint'] = file_rel_path
-                topMeta['remote_workflow_entrypoint'] = metadataPD.get('url')
-                
-                descriptorMeta = None
-                metadataPD = None
-                
-            # and another for the raw content (in case no workflow repo is identified)
-            _ , metaelem = fetchClassicURL(file_url, absfile, {'headers': { 'Accept': 'text/plain' } })
-            metadata_array.extend(metaelem)
-    
+
+            fetchTasks.append((file_rel_path, file_url, absfile, file_desc.get('file_type') == 'PRIMARY_DESCRIPTOR'))
+
+    def fetchOneFile(fetchTask):
+        file_rel_path , file_url , absfile , isPrimary = fetchTask
+
+        primaryMeta = None
+        elemMeta = []
+        # it is fetched twice, one for the metadata,
+        if isPrimary:
+            descriptorMeta = io.BytesIO()
+            _ , metaprimary = fetchClassicURL(file_url, descriptorMeta)
+            elemMeta.extend(metaprimary)
+
+            # This metadata can help a lot to get the workflow repo
+            metadataPD = json.loads(descriptorMeta.getvalue().decode('utf-8'))
+            primaryMeta = (file_rel_path, metadataPD.get('url'))
+
+            descriptorMeta = None
+            metadataPD = None
+
+        # and another for the raw content (in case no workflow repo is identified)
+        _ , metaelem = fetchClassicURL(file_url, absfile, PLAIN_CONTENT_SEC_CONTEXT)
+        elemMeta.extend(metaelem)
+
+        return primaryMeta, elemMeta
+
+    # Second pass, as the files are independent from each other they
+    # are fetched concurrently, keeping the metadata gathering order
+    if len(fetchTasks) > 0:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(fetchTasks), MAX_TRS_FETCH_WORKERS)) as executor:
+            for primaryMeta, elemMeta in executor.map(fetchOneFile, fetchTasks):
+                if primaryMeta is not None:
+                    topMeta['workflow_entrypoint'] , topMeta['remote_workflow_entrypoint'] = primaryMeta
+                metadata_array.extend(elemMeta)
+
     if emptyWorkflow:
         raise WFException("Error processing TRS files for {} : no file was found.\n{}".format(remote_file, metadata))
     
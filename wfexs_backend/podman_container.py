@@ -62,7 +62,7 @@ class PodmanContainerFactory(ContainerFactory):
             self.logger.debug(f"podman inspect {dockerTag} retval: {d_retval}")
             
             with open(d_out.name, mode="rb") as c_stF:
-                d_out_v = c_stF.read().decode('utf-8', errors='continue')
+                d_out_v = c_stF.read().decode('utf-8', errors='ignore')
             with open(d_err.name, mode="r") as c_stF:
                 d_err_v = c_stF.read()
             
@@ -16,6 +16,7 @@
 # limitations under the License.
 from __future__ import absolute_import
 
+import concurrent.futures
 import json
 import os
 import os.path
@@ -33,6 +34,8 @@ from .utils.docker import DockerHelper
 
 class SingularityContainerFactory(ContainerFactory):
     META_JSON_POSTFIX = '_meta.json'
+    # Maximum number of images being materialized at once
+    MAX_PULL_WORKERS = 4
     def __init__(self, cacheDir=None, local_config=None, engine_name='unset', tempDir=None):
         super().__init__(cacheDir=cacheDir, local_config=local_config, engine_name=engine_name, tempDir=tempDir)
         self.runtime_cmd = local_config.get('tools', {}).get('singularityCommand', DEFAULT_SINGULARITY_CMD)
@@ -82,116 +85,134 @@ class SingularityContainerFactory(ContainerFactory):
     def materializeContainers(self, tagList: List[ContainerTaggedName], simpleFileNameMethod: ContainerFileNamingMethod, offline: bool = False) -> List[Container]:
         """
         It is assured the containers are materialized
+
+        As the images are independent from each other, they are pulled
+        in parallel, which hides most of the per-image network latency
         """
-        containersList = []
-        
         matEnv = dict(os.environ)
         matEnv.update(self.environment)
+
+        materializeTag = lambda tag: self.materializeSingleContainer(tag, simpleFileNameMethod, matEnv, offline)
+        if len(tagList) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(tagList), self.MAX_PULL_WORKERS)) as executor:
+                # The list keeps the ordering from tagList
+                containersList = list(executor.map(materializeTag, tagList))
+        else:
+            containersList = list(map(materializeTag, tagList))
+
+        return containersList
+
+    def materializeSingleContainer(self, tag: ContainerTaggedName, simpleFileNameMethod: ContainerFileNamingMethod, matEnv: Dict[str, str], offline: bool = False) -> Container:
+        """
+        It is assured a single container is materialized
+        """
+        # It is not an absolute URL, we are prepending the docker://
+        parsedTag = parse.urlparse(tag)
+        singTag = 'docker://' + tag  if parsedTag.scheme == ''  else tag
+
+        # Each invocation gets its own helper, so concurrent queries
+        # do not share connection state
         dhelp = DockerHelper()
-        for tag in tagList:
-            # It is not an absolute URL, we are prepending the docker://
-            parsedTag = parse.urlparse(tag)
-            singTag = 'docker://' + tag  if parsedTag.scheme == ''  else tag
+
+        containerFilename = simpleFileNameMethod(tag)
+        localContainerPath = os.path.join(self.engineContainersSymlinkDir,containerFilename)
+        localContainerPathMeta = localContainerPath + self.META_JSON_POSTFIX
+        
+        self.logger.info("downloading container: {} => {}".format(tag, localContainerPath))
+        # First, let's materialize the container image
+        imageSignature = None
+        
+        tmpContainerPath = None
+        tmpContainerPathMeta = None
+        if os.path.isfile(localContainerPathMeta):
+            with open(localContainerPathMeta, mode="r", encoding="utf8") as tcpm:
+                metadata = json.loads(tcpm.read())
+                registryServer = metadata['registryServer']
+                repo = metadata['repo']
+                alias = metadata['alias']
+                partial_fingerprint = metadata['dcd']
+        elif offline:
+            raise ContainerFactoryException("Cannot download containers metadata in offline mode from {} to {}".format(tag, localContainerPath))
+        else:
+            tmpContainerPath = os.path.join(self.containersCacheDir,str(uuid.uuid4()))
+            tmpContainerPathMeta = tmpContainerPath + self.META_JSON_POSTFIX
             
-            containerFilename = simpleFileNameMethod(tag)
-            localContainerPath = os.path.join(self.engineContainersSymlinkDir,containerFilename)
-            localContainerPathMeta = localContainerPath + self.META_JSON_POSTFIX
+            self.logger.debug("downloading temporary container metadata: {} => {}".format(tag, tmpContainerPathMeta))
             
-            self.logger.info("downloading container: {} => {}".format(tag, localContainerPath))
-            # First, let's materialize the container image
-            imageSignature = None
+            with open(tmpContainerPathMeta, mode="w", encoding="utf8") as tcpm:
+                registryServer, repo, alias, partial_fingerprint = dhelp.query_tag(singTag)
+                json.dump({
+                    'registryServer': registryServer,
+                    'repo': repo,
+                    'alias': alias,
+                    'dcd': partial_fingerprint,
+                }, tcpm)
+        
             
-            tmpContainerPath = None
-            tmpContainerPathMeta = None
-            if os.path.isfile(localContainerPathMeta):
-                with open(localContainerPathMeta, mode="r", encoding="utf8") as tcpm:
-                    metadata = json.load(tcpm)
-                    registryServer = metadata['registryServer']
-                    repo = metadata['repo']
-                    alias = metadata['alias']
-                    partial_fingerprint = metadata['dcd']
-            elif offline:
-                raise ContainerFactoryException("Cannot download containers metadata in offline mode from {} to {}".format(tag, localContainerPath))
-            else:
-                tmpContainerPath = os.path.join(self.containersCacheDir,str(uuid.uuid4()))
-                tmpContainerPathMeta = tmpContainerPath + self.META_JSON_POSTFIX
+        canonicalContainerPath = None
+        canonicalContainerPathMeta = None
+        if not os.path.isfile(localContainerPath):
+            if offline:
+                raise ContainerFactoryException("Cannot download containers in offline mode from {} to {}".format(tag, localContainerPath))
                 
-                self.logger.debug("downloading temporary container metadata: {} => {}".format(tag, tmpContainerPathMeta))
+            with tempfile.NamedTemporaryFile() as s_out, tempfile.NamedTemporaryFile() as s_err:
+                if tmpContainerPath is None:
+                    tmpContainerPath = os.path.join(self.containersCacheDir,str(uuid.uuid4()))
                 
-                with open(tmpContainerPathMeta, mode="w", encoding="utf8") as tcpm:
-                    registryServer, repo, alias, partial_fingerprint = dhelp.query_tag(singTag)
-                    json.dump({
-                        'registryServer': registryServer,
-                        'repo': repo,
-                        'alias': alias,
-                        'dcd': partial_fingerprint,
-                    }, tcpm)
-            
+                self.logger.debug("downloading temporary container: {} => {}".format(tag, tmpContainerPath))
+                # Singularity command line borrowed from
+                # https://github.com/nextflow-io/nextflow/blob/539a22b68c114c94eaf4a88ea8d26b7bfe2d0c39/modules/nextflow/src/main/groovy/nextflow/container/SingularityCache.groovy#L221
+                s_retval = subprocess.Popen(
+                    [self.runtime_cmd, 'pull', '--name', tmpContainerPath, singTag],
+                    env=matEnv,
+                    stdout=s_out,
+                    stderr=s_err
+                ).wait()
                 
-            canonicalContainerPath = None
-            canonicalContainerPathMeta = None
-            if not os.path.isfile(localContainerPath):
-                if offline:
-                    raise ContainerFactoryException("Cannot download containers in offline mode from {} to {}".format(tag, localContainerPath))
-                    
-                with tempfile.NamedTemporaryFile() as s_out, tempfile.NamedTemporaryFile() as s_err:
-                    if tmpContainerPath is None:
-                        tmpContainerPath = os.path.join(self.containersCacheDir,str(uuid.uuid4()))
-                    
-                    self.logger.debug("downloading temporary container: {} => {}".format(tag, tmpContainerPath))
-                    # Singularity command line borrowed from
-                    # https://github.com/nextflow-io/nextflow/blob/539a22b68c114c94eaf4a88ea8d26b7bfe2d0c39/modules/nextflow/src/main/groovy/nextflow/container/SingularityCache.groovy#L221
-                    s_retval = subprocess.Popen(
-                        [self.runtime_cmd, 'pull', '--name', tmpContainerPath, singTag],
-                        env=matEnv,
-                        stdout=s_out,
-                        stderr=s_err
-                    ).wait()
-                    
-                    self.logger.debug("singularity pull retval: {}".format(s_retval))
-                    
-                    with open(s_out.name,"r") as c_stF:
-                        s_out_v = c_stF.read()
-                    with open(s_err.name,"r") as c_stF:
-                        s_err_v = c_stF.read()
-                    
-                    self.logger.debug("singularity pull stdout: {}".format(s_out_v))
-                    
-                    self.logger.debug("singularity pull stderr: {}".format(s_err_v))
+                self.logger.debug("singularity pull retval: {}".format(s_retval))
+                
+                with open(s_out.name,"r") as c_stF:
+                    s_out_v = c_stF.read()
+                with open(s_err.name,"r") as c_stF:
+                    s_err_v = c_stF.read()
+                
+                self.logger.debug("singularity pull stdout: {}".format(s_out_v))
+                
+                self.logger.debug("singularity pull stderr: {}".format(s_err_v))
+                
+                # Reading the output and error for the report
+                if s_retval == 0:
+                    if not os.path.exists(tmpContainerPath):
+                        raise ContainerFactoryException("FATAL ERROR: Singularity finished properly but it did not materialize {} into {}".format(tag, tmpContainerPath))
                     
-                    # Reading the output and error for the report
-                    if s_retval == 0:
-                        if not os.path.exists(tmpContainerPath):
-                            raise ContainerFactoryException("FATAL ERROR: Singularity finished properly but it did not materialize {} into {}".format(tag, tmpContainerPath))
-                        
-                        imageSignature = ComputeDigestFromFile(tmpContainerPath)
-                        # Some filesystems complain when filenames contain 'equal', 'slash' or 'plus' symbols
-                        canonicalContainerPath = os.path.join(self.containersCacheDir, imageSignature.replace('=','~').replace('/','-').replace('+','_'))
-                        if os.path.exists(canonicalContainerPath):
-                            tmpSize = os.path.getsize(tmpContainerPath)
-                            canonicalSize = os.path.getsize(canonicalContainerPath)
-                            
-                            # Remove the temporary one
-                            os.unlink(tmpContainerPath)
-                            tmpContainerPath = None
-                            if tmpContainerPathMeta is not None:
-                                os.unlink(tmpContainerPathMeta)
-                                tmpContainerPathMeta = None
-                            if tmpSize != canonicalSize:
-                                # If files were not the same complain
-                                # This should not happen!!!!!
-                                raise ContainerFactoryException("FATAL ERROR: Singularity cache collision for {}, with differing sizes ({} local, {} remote {})".format(imageSignature,canonicalSize,tmpSize,tag))
-                        else:
-                            shutil.move(tmpContainerPath, canonicalContainerPath)
-                            tmpContainerPath = None
+                    imageSignature = ComputeDigestFromFile(tmpContainerPath)
+                    # Some filesystems complain when filenames contain 'equal', 'slash' or 'plus' symbols
+                    canonicalContainerPath = os.path.join(self.containersCacheDir, imageSignature.replace('=','~').replace('/','-').replace('+','_'))
+                    if os.path.exists(canonicalContainerPath):
+                        tmpSize = os.path.getsize(tmpContainerPath)
+                        canonicalSize = os.path.getsize(canonicalContainerPath)
                         
-                        # Now, create the relative symbolic link
-                        if os.path.lexists(localContainerPath):
-                            os.unlink(localContainerPath)
-                        os.symlink(os.path.relpath(canonicalContainerPath,self.engineContainersSymlinkDir),localContainerPath)
-                            
+                        # Remove the temporary one
+                        os.unlink(tmpContainerPath)
+                        tmpContainerPath = None
+                        if tmpContainerPathMeta is not None:
+                            os.unlink(tmpContainerPathMeta)
+                            tmpContainerPathMeta = None
+                        if tmpSize != canonicalSize:
+                            # If files were not the same complain
+                            # This should not happen!!!!!
+                            raise ContainerFactoryException("FATAL ERROR: Singularity cache collision for {}, with differing sizes ({} local, {} remote {})".format(imageSignature,canonicalSize,tmpSize,tag))
                     else:
-                        errstr = """Could not materialize singularity image {}. Retval {}
+                        shutil.move(tmpContainerPath, canonicalContainerPath)
+                        tmpContainerPath = None
+                    
+                    # Now, create the relative symbolic link
+                    if os.path.lexists(localContainerPath):
+                        os.unlink(localContainerPath)
+                    os.symlink(os.path.relpath(canonicalContainerPath,self.engineContainersSymlinkDir),localContainerPath)
+                        
+                else:
+                    errstr = """Could not materialize singularity image {}. Retval {}
 ======
 STDOUT
 ======
@@ -201,39 +222,35 @@ STDOUT
 STDERR
 ======
 {}""".format(singTag, s_retval, s_out_v, s_err_v)
-                        if os.path.exists(tmpContainerPath):
-                            try:
-                                os.unlink(tmpContainerPath)
-                            except:
-                                pass
-                        raise ContainerFactoryException(errstr)
-            
-            # Only metadata was generated
-            if tmpContainerPathMeta is not None:
-                if canonicalContainerPath is None:
-                    canonicalContainerPath = os.path.normpath(os.path.join(self.engineContainersSymlinkDir, os.readlink(localContainerPath)))
-                canonicalContainerPathMeta = canonicalContainerPath + self.META_JSON_POSTFIX
-                shutil.move(tmpContainerPathMeta, canonicalContainerPathMeta)
-            
-            if canonicalContainerPathMeta is not None:
-                if os.path.lexists(localContainerPathMeta):
-                    os.unlink(localContainerPathMeta)
-                os.symlink(os.path.relpath(canonicalContainerPathMeta,self.engineContainersSymlinkDir),localContainerPathMeta)
-                
-            
-            # Then, compute the signature
-            if imageSignature is None:
-                imageSignature = ComputeDigestFromFile(localContainerPath, repMethod=nihDigest)
+                    if os.path.exists(tmpContainerPath):
+                        try:
+                            os.unlink(tmpContainerPath)
+                        except:
+                            pass
+                    raise ContainerFactoryException(errstr)
+        
+        # Only metadata was generated
+        if tmpContainerPathMeta is not None:
+            if canonicalContainerPath is None:
+                canonicalContainerPath = os.path.normpath(os.path.join(self.engineContainersSymlinkDir, os.readlink(localContainerPath)))
+            canonicalContainerPathMeta = canonicalContainerPath + self.META_JSON_POSTFIX
+            shutil.move(tmpContainerPathMeta, canonicalContainerPathMeta)
+        
+        if canonicalContainerPathMeta is not None:
+            if os.path.lexists(localContainerPathMeta):
+                os.unlink(localContainerPathMeta)
+            os.symlink(os.path.relpath(canonicalContainerPathMeta,self.engineContainersSymlinkDir),localContainerPathMeta)
             
-            containersList.append(
-                Container(
-                    origTaggedName=tag,
-                    taggedName=singTag,
-                    signature=imageSignature,
-                    fingerprint=repo + '@' + partial_fingerprint,
-                    type=self.containerType,
-                    localPath=localContainerPath
-                )
-            )
         
-        return containersList
+        # Then, compute the signature
+        if imageSignature is None:
+            imageSignature = ComputeDigestFromFile(localContainerPath, repMethod=nihDigest)
+        
+        return Container(
+            origTaggedName=tag,
+            taggedName=singTag,
+            signature=imageSignature,
+            fingerprint=repo + '@' + partial_fingerprint,
+            type=self.containerType,
+            localPath=localContainerPath
+        )
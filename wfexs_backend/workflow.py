@@ -17,33 +17,37 @@
 from __future__ import absolute_import
 
 import atexit
-import http
+import functools
 import io
 import json
 import jsonschema
 import logging
 import pathlib
-import platform
+import pickle
+import posixpath
+import re
 import shutil
 import sys
 import threading
-import time
-import types
 import uuid
 
-from pathlib import Path
 from typing import List, Mapping, Pattern, Tuple, Union
-from urllib import request, parse
+from urllib import parse
 
-from rocrate import rocrate
-import bagit
 
 # We have preference for the C based loader and dumper, but the code
 # should fallback to default implementations when C ones are not present
 try:
-    from yaml import CLoader as YAMLLoader, CDumper as YAMLDumper
+    from yaml import CLoader as YAMLLoader, CSafeLoader as YAMLSafeLoader, CDumper as YAMLDumper
 except ImportError:
-    from yaml import Loader as YAMLLoader, Dumper as YAMLDumper
+    from yaml import Loader as YAMLLoader, SafeLoader as YAMLSafeLoader, Dumper as YAMLDumper
+    # The fallback must not be silent, as the pure Python implementation
+    # is an order of magnitude slower on the marshalled state files
+    logging.getLogger(__name__).warning(
+        'LibYAML C extension is not available, falling back to the '
+        'much slower pure Python YAML loader and dumper. Consider '
+        'reinstalling PyYAML with libyaml support.'
+    )
 import yaml
 
 import crypt4gh.lib
@@ -76,12 +80,96 @@ WORKFLOW_ENGINE_CLASSES = [
     NextflowWorkflowEngine,
 ]
 
+# Matching 'git' and pip-style 'git+...' schemes, compiled once at
+# import time instead of being re-evaluated on each guess
+GIT_SCHEME_PATTERN = re.compile(r'^git(\+|$)')
+
+# The same workflow and repository URIs are parsed over and over along
+# a staging session, so the split results are memoized
+cached_urlparse = functools.lru_cache(maxsize=128)(parse.urlparse)
+
 
 class WF:
     """
     Workflow enaction class
     """
 
+    # Declaring the instance attributes beforehand removes the
+    # per-instance __dict__ and turns attribute access into fixed
+    # slot offsets, which matters when many instances are alive
+    __slots__ = (
+        'logger',
+        'local_config',
+        '_configYAMLCache',
+        'git_cmd',
+        'encfs_type',
+        'encfs_cmd',
+        'fusermount_cmd',
+        'encfs_idleMinutes',
+        'config_directory',
+        'pubKey',
+        'privKey',
+        'cacheDir',
+        'cacheWorkflowDir',
+        'cacheROCrateDir',
+        'cacheTRSFilesDir',
+        'cacheWorkflowInputsDir',
+        'baseWorkDir',
+        'rawWorkDir',
+        'workDir',
+        'encWorkDir',
+        'tempDir',
+        'encfsThread',
+        'encfsEvent',
+        'doUnmount',
+        'paranoidMode',
+        'bag',
+        'parsedROCrateCache',
+        'cacheHandler',
+        'id',
+        'version_id',
+        'descriptor_type',
+        'trs_endpoint',
+        'trs_tools_url',
+        'trs_endpoint_meta',
+        'params',
+        'outputs',
+        'workflow_config',
+        'creds_config',
+        'instanceId',
+        'secure',
+        'allowOther',
+        'inputsDir',
+        'intermediateDir',
+        'outputsDir',
+        'engineTweaksDir',
+        'metaDir',
+        'workflowMetaFilename',
+        'securityContextFilename',
+        'marshalledStageFilename',
+        'marshalledExecuteFilename',
+        'marshalledExportFilename',
+        'repoURL',
+        'repoTag',
+        'repoRelPath',
+        'repoDir',
+        'repoEffectiveCheckout',
+        'engine',
+        'engineVer',
+        'engineDesc',
+        'materializedEngine',
+        'localWorkflow',
+        'materializedParams',
+        'listOfContainers',
+        'exitVal',
+        'augmentedInputs',
+        'matCheckOutputs',
+        'cacheROCrateFilename',
+        'stageMarshalled',
+        'executionMarshalled',
+        'exportMarshalled',
+    )
+
     DEFAULT_PASSPHRASE_LENGTH = 4
 
     CRYPT4GH_SECTION = 'crypt4gh'
@@ -101,9 +189,12 @@ class WF:
     DEFAULT_RO_EXTENSION = ".crate.zip"
     DEFAULT_TRS_ENDPOINT = "https://dev.workflowhub.eu/ga4gh/trs/v2/"  # root of GA4GH TRS API
     TRS_TOOLS_PATH = 'tools/'
-    WORKFLOW_ENGINES = list(map(lambda clazz: clazz.WorkflowType(), WORKFLOW_ENGINE_CLASSES))
+    # Precomputed once, so the endpoint normalization below does a
+    # single endswith check without rebuilding the suffix each time
+    TRS_TOOLS_SUFFIX = '/' + TRS_TOOLS_PATH
+    WORKFLOW_ENGINES = [ clazz.WorkflowType() for clazz in WORKFLOW_ENGINE_CLASSES ]
 
-    RECOGNIZED_TRS_DESCRIPTORS = dict(map(lambda t: (t.trs_descriptor, t), WORKFLOW_ENGINES))
+    RECOGNIZED_TRS_DESCRIPTORS = { engineDesc.trs_descriptor: engineDesc for engineDesc in WORKFLOW_ENGINES }
     
     @classmethod
     def generate_passphrase(cls) -> str:
@@ -168,12 +259,13 @@ class WF:
             if not os.path.isabs(fname):
                 fname = os.path.normpath(os.path.join(config_directory, fname))
 
-            if os.path.exists(fname):
-                if os.path.getsize(fname) == 0:
+            # A single stat answers both existence and emptiness
+            try:
+                if os.stat(fname).st_size == 0:
                     logger.warning("[WARNING] Installation {} file {} is empty".format(elem, fname))
                 else:
                     numExist += 1
-            else:
+            except FileNotFoundError:
                 logger.warning("[WARNING] Installation {} file {} does not exist".format(elem, fname))
 
         if numExist == 1:
@@ -236,19 +328,51 @@ class WF:
             creds_config=creds_config
         )
     
+    # Validators already compiled from their schema files, shared by
+    # all the instances, as schemas do not change along a run
+    _COMPILED_SCHEMA_VALIDATORS = {}
+
+    # Validation results of already seen configuration contents,
+    # keyed by the schema file and a digest of the content, as the
+    # same workflow_meta and creds_config are revalidated on
+    # re-staging and re-hydration cycles
+    _SCHEMA_VALIDATION_MEMO = {}
+
     @classmethod
     def ConfigValidate(cls, configToValidate, relSchemaFile):
-        # Locating the schemas directory, where all the schemas should be placed
-        schemaFile = os.path.join(os.path.dirname(__file__), cls.SCHEMAS_REL_DIR, relSchemaFile)
-        
+        jv = cls._COMPILED_SCHEMA_VALIDATORS.get(relSchemaFile)
+        if jv is None:
+            # Locating the schemas directory, where all the schemas should be placed
+            schemaFile = os.path.join(os.path.dirname(__file__), cls.SCHEMAS_REL_DIR, relSchemaFile)
+
+            try:
+                with open(schemaFile, mode="r", encoding="utf-8") as sF:
+                    schema = json.load(sF)
+
+                jv = jsonschema.validators.validator_for(schema)(schema)
+            except Exception as e:
+                raise WFException(f"FATAL ERROR: corrupted schema {relSchemaFile}. Reason: {e}")
+
+            cls._COMPILED_SCHEMA_VALIDATORS[relSchemaFile] = jv
+
+        # Validation is a pure function of the schema and the content,
+        # so the outcome is memoized by a content digest. Contents
+        # which cannot be serialized are validated straight away.
         try:
-            with open(schemaFile, mode="r", encoding="utf-8") as sF:
-                schema = json.load(sF)
-            
-            jv = jsonschema.validators.validator_for(schema)(schema)
-            return list(jv.iter_errors(instance=configToValidate))
-        except Exception as e:
-            raise WFException(f"FATAL ERROR: corrupted schema {relSchemaFile}. Reason: {e}")
+            memoKey = (relSchemaFile, hashlib.sha256(json.dumps(configToValidate, sort_keys=True, default=str).encode('utf-8')).digest())
+        except Exception:
+            memoKey = None
+
+        if memoKey is not None:
+            valErrors = cls._SCHEMA_VALIDATION_MEMO.get(memoKey)
+            if valErrors is not None:
+                return valErrors
+
+        valErrors = list(jv.iter_errors(instance=configToValidate))
+        if memoKey is not None:
+            cls._SCHEMA_VALIDATION_MEMO[memoKey] = valErrors
+
+        return valErrors
     
     def __init__(self, local_config=None, config_directory=None):
         """
@@ -271,6 +395,10 @@ class WF:
         
         self.local_config = local_config
 
+        # Deserialized configuration files, keyed by filename, along
+        # with the stat fields used to detect on-disk changes
+        self._configYAMLCache = {}
+
         toolSect = local_config.get('tools', {})
         self.git_cmd = toolSect.get('gitCommand', DEFAULT_GIT_CMD)
 
@@ -350,9 +478,15 @@ class WF:
         self.encWorkDir = None
         self.tempDir = None
         self.encfsThread = None
+        # Used to signal the keep-alive thread, so it does not have to
+        # poll on a fixed schedule once the directory is unmounted
+        self.encfsEvent = threading.Event()
         self.doUnmount = False
         self.paranoidMode = False
         self.bag = None
+
+        # In-memory cache of already parsed RO-Crates, keyed by filename
+        self.parsedROCrateCache = {}
         
         self.stageMarshalled = False
         self.executionMarshalled = False
@@ -423,16 +557,19 @@ class WF:
         
         valErrors = self.ConfigValidate(workflow_meta, self.STAGE_DEFINITION_SCHEMA)
         if len(valErrors) > 0:
-            self.logger.error(f'ERROR in workflow staging definition block: {valErrors}')
-            raise WFException(f'ERROR in workflow staging definition block: {valErrors}')
+            # Formatted once, both for the log and for the exception
+            errstr = f'ERROR in workflow staging definition block: {valErrors}'
+            self.logger.error(errstr)
+            raise WFException(errstr)
 
         if not isinstance(creds_config, dict):
             creds_config = {}
-        
+
         valErrors = self.ConfigValidate(creds_config, self.SECURITY_CONTEXT_SCHEMA)
         if len(valErrors) > 0:
-            self.logger.error(f'ERROR in security context block: {valErrors}')
-            raise WFException(f'ERROR in security context block: {valErrors}')
+            errstr = f'ERROR in security context block: {valErrors}'
+            self.logger.error(errstr)
+            raise WFException(errstr)
 
         if not isinstance(params, dict):
             params = {}
@@ -456,11 +593,22 @@ class WF:
                 trs_endpoint += '/'
 
             # Removing the tools suffix, which appeared in first WfExS iterations
-            if trs_endpoint.endswith('/' + self.TRS_TOOLS_PATH):
+            if trs_endpoint.endswith(self.TRS_TOOLS_SUFFIX):
                 trs_endpoint = trs_endpoint[0:-len(self.TRS_TOOLS_PATH)]
 
         self.trs_endpoint = trs_endpoint
 
+        # As both the endpoint and the workflow id are immutable, the TRS
+        # tool URL is built once here instead of on each TRS lookup
+        if isinstance(trs_endpoint, str):
+            self.trs_tools_url = parse.urljoin(trs_endpoint, self.TRS_TOOLS_PATH + parse.quote(self.id, safe=''))
+        else:
+            self.trs_tools_url = None
+
+        # Lazily populated by getWorkflowRepoFromTRS, as the endpoint
+        # metadata only has to be probed once per instance
+        self.trs_endpoint_meta = None
+
         if self.rawWorkDir is None:
             self.instanceId = str(uuid.uuid4())
             # This directory is the raw working directory
@@ -479,26 +627,41 @@ class WF:
 
             self.setupWorkdir(doSecureWorkDir)
 
-        # This directory will hold either symbolic links to the cached
-        # inputs, or the inputs properly post-processed (decompressed,
-        # decrypted, etc....)
-        self.inputsDir = os.path.join(self.workDir, WORKDIR_INPUTS_RELDIR)
-        os.makedirs(self.inputsDir, exist_ok=True)
-        # This directory should hold intermediate workflow steps results
-        self.intermediateDir = os.path.join(self.workDir, WORKDIR_INTERMEDIATE_RELDIR)
-        os.makedirs(self.intermediateDir, exist_ok=True)
-        # This directory will hold the final workflow results, which could
-        # be either symbolic links to the intermediate results directory
-        # or newly generated content
-        self.outputsDir = os.path.join(self.workDir, WORKDIR_OUTPUTS_RELDIR)
-        os.makedirs(self.outputsDir, exist_ok=True)
-        # This directory is here for those files which are created in order
-        # to tweak or patch workflow executions
-        self.engineTweaksDir = os.path.join(self.workDir, WORKDIR_ENGINE_TWEAKS_RELDIR)
-        os.makedirs(self.engineTweaksDir, exist_ok=True)
-        # This directory will hold metadata related to the execution
-        self.metaDir = os.path.join(self.workDir, WORKDIR_META_RELDIR)
-        os.makedirs(self.metaDir, exist_ok=True)
+        # These directories hold, respectively: either symbolic links
+        # to the cached inputs, or the inputs properly post-processed
+        # (decompressed, decrypted, etc....); intermediate workflow
+        # steps results; the final workflow results, which could be
+        # either symbolic links to the intermediate results directory
+        # or newly generated content; those files which are created in
+        # order to tweak or patch workflow executions; and metadata
+        # related to the execution.
+        # As the parent workDir is known to exist, each leaf is created
+        # through a single mkdir call, instead of the path walk done
+        # by os.makedirs
+        for workSubDirAttr, workSubDirRel in (
+            ('inputsDir', WORKDIR_INPUTS_RELDIR),
+            ('intermediateDir', WORKDIR_INTERMEDIATE_RELDIR),
+            ('outputsDir', WORKDIR_OUTPUTS_RELDIR),
+            ('engineTweaksDir', WORKDIR_ENGINE_TWEAKS_RELDIR),
+            ('metaDir', WORKDIR_META_RELDIR),
+        ):
+            workSubDir = os.path.join(self.workDir, workSubDirRel)
+            try:
+                os.mkdir(workSubDir)
+            except FileExistsError:
+                # Only an existing directory is acceptable, anything
+                # else in the way has to surface right now
+                if not os.path.isdir(workSubDir):
+                    raise
+            setattr(self, workSubDirAttr, workSubDir)
+
+        # Filenames inside metaDir which are used on every marshalling
+        # and unmarshalling round, joined only once per working directory
+        self.workflowMetaFilename = os.path.join(self.metaDir, WORKDIR_WORKFLOW_META_FILE)
+        self.securityContextFilename = os.path.join(self.metaDir, WORKDIR_SECURITY_CONTEXT_FILE)
+        self.marshalledStageFilename = os.path.join(self.metaDir, WORKDIR_MARSHALLED_STAGE_FILE)
+        self.marshalledExecuteFilename = os.path.join(self.metaDir, WORKDIR_MARSHALLED_EXECUTE_FILE)
+        self.marshalledExportFilename = os.path.join(self.metaDir, WORKDIR_MARSHALLED_EXPORT_FILE)
         
         self.marshallConfig(overwrite=False)
         
@@ -534,11 +697,10 @@ class WF:
             # the only way I know is parsing /etc/fuse.conf
             if not self.paranoidMode and os.path.exists(self.FUSE_SYSTEM_CONF):
                 with open(self.FUSE_SYSTEM_CONF, mode="r") as fsc:
-                    for line in fsc:
-                        if line.startswith('user_allow_other'):
-                            allowOther = True
-                            break
-                    self.logger.debug(f"FUSE has user_allow_other: {allowOther}")
+                    # any() short-circuits on the first match, like the
+                    # previous explicit loop, but runs the scan in C
+                    allowOther = any(line.startswith('user_allow_other') for line in fsc)
+                self.logger.debug(f"FUSE has user_allow_other: {allowOther}")
             
             uniqueEncWorkDir = os.path.join(uniqueRawWorkDir, '.crypt')
             uniqueWorkDir = os.path.join(uniqueRawWorkDir, 'work')
@@ -602,13 +764,14 @@ class WF:
                                                                uniqueWorkDir, uniqueRawWorkDir, securePassphrase,
                                                                allowOther)
 
-                # and start the thread which keeps the mount working 
-                self.encfsThread = threading.Thread(target=self._wakeupEncDir, daemon=True)
-                self.encfsThread.start()
-
                 # We are going to unmount what we have mounted
                 self.doUnmount = True
 
+                # and start the thread which keeps the mount working
+                self.encfsEvent.clear()
+                self.encfsThread = threading.Thread(target=self._wakeupEncDir, daemon=True)
+                self.encfsThread.start()
+
             # self.encfsPassphrase = securePassphrase
             del securePassphrase
         else:
@@ -629,43 +792,43 @@ class WF:
 
     def _wakeupEncDir(self):
         """
-        This method periodically checks whether the directory is still available
+        This method periodically checks whether the directory is still
+        available, and finishes as soon as the unmount is signalled
+        instead of sleeping through a whole polling period
         """
-        while True:
-            time.sleep(60)
+        while not self.encfsEvent.wait(60):
             os.path.isdir(self.workDir)
 
     def unmountWorkdir(self):
         if self.doUnmount and (self.encWorkDir is not None):
             # Only unmount if it is needed
             if os.path.ismount(self.workDir):
-                with tempfile.NamedTemporaryFile() as encfs_umount_stdout, tempfile.NamedTemporaryFile() as encfs_umount_stderr:
-                    fusermountCommand = [
-                        self.fusermount_cmd,
-                        '-u',  # Umount the directory
-                        '-z',  # Even if it is not possible to umount it now, hide the mount point
-                        self.workDir,
-                    ]
-
-                    retval = subprocess.Popen(
-                        fusermountCommand,
-                        stdout=encfs_umount_stdout,
-                        stderr=encfs_umount_stderr,
-                    ).wait()
-
-                    if retval != 0:
-                        with open(encfs_umount_stdout.name, mode="r") as c_stF:
-                            encfs_umount_stdout_v = c_stF.read()
-                        with open(encfs_umount_stderr.name, mode="r") as c_stF:
-                            encfs_umount_stderr_v = c_stF.read()
+                fusermountCommand = [
+                    self.fusermount_cmd,
+                    '-u',  # Umount the directory
+                    '-z',  # Even if it is not possible to umount it now, hide the mount point
+                    self.workDir,
+                ]
 
-                        errstr = "Could not umount {} (retval {})\nCommand: {}\n======\nSTDOUT\n======\n{}\n======\nSTDERR\n======\n{}".format(
-                            self.encfs_type, retval, ' '.join(fusermountCommand), encfs_umount_stdout_v,
-                            encfs_umount_stderr_v)
-                        raise WFException(errstr)
+                # The fusermount output is tiny, so it is kept in
+                # memory through pipes instead of temporary files
+                completedProc = subprocess.run(
+                    fusermountCommand,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                )
+
+                if completedProc.returncode != 0:
+                    errstr = "Could not umount {} (retval {})\nCommand: {}\n======\nSTDOUT\n======\n{}\n======\nSTDERR\n======\n{}".format(
+                        self.encfs_type, completedProc.returncode, ' '.join(fusermountCommand),
+                        completedProc.stdout.decode('utf-8', errors='ignore'),
+                        completedProc.stderr.decode('utf-8', errors='ignore'))
+                    raise WFException(errstr)
 
             # This is needed to avoid double work
             self.doUnmount = False
+            # Waking up the keep-alive thread right away
+            self.encfsEvent.set()
             self.encWorkDir = None
             self.workDir = None
 
@@ -705,14 +868,58 @@ class WF:
     def enableParanoidMode(self):
         self.paranoidMode = True
 
+    def _readConfigYAML(self, configFilename):
+        """
+        Slurps, parses and unmarshalls one of the user provided
+        configuration files, either the workflow staging definition
+        or the security contexts one
+
+        The deserialized object is kept, both in memory and in a
+        sibling pickle, so repeated reads of an unchanged file skip
+        both the YAML parse and the unmarshalling, even across runs
+        """
+        fStat = os.stat(configFilename)
+        cached = self._configYAMLCache.get(configFilename)
+        if cached is not None and cached[0] == fStat.st_mtime_ns and cached[1] == fStat.st_size:
+            return cached[2]
+
+        # On-disk cache of the deserialized content, which survives the
+        # process. It is best-effort: whenever it is missing, stale or
+        # unreadable, the YAML source below is authoritative
+        pickledConfigFilename = configFilename + '.cache.pkl'
+        try:
+            with open(pickledConfigFilename, mode="rb") as pF:
+                pickledMtimeNs, pickledSize, config = pickle.load(pF)
+            if pickledMtimeNs == fStat.st_mtime_ns and pickledSize == fStat.st_size:
+                self._configYAMLCache[configFilename] = (fStat.st_mtime_ns, fStat.st_size, config)
+                return config
+        except Exception:
+            pass
+
+        with open(configFilename, mode="r", encoding="utf-8") as cF:
+            # A single read hands the whole buffer to the parser.
+            # User provided files only hold plain mappings and scalars,
+            # so the C accelerated safe loader is enough for them; the
+            # marshalled state files keep the full loader, as they
+            # carry python-tagged objects
+            config = unmarshall_namedtuple(yaml.load(cF.read(), Loader=YAMLSafeLoader))
+        self._configYAMLCache[configFilename] = (fStat.st_mtime_ns, fStat.st_size, config)
+
+        try:
+            with open(pickledConfigFilename, mode="wb") as pF:
+                pickle.dump((fStat.st_mtime_ns, fStat.st_size, config), pF, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # A read-only location is not an error
+            self.logger.debug("Could not write config cache {}: {}".format(pickledConfigFilename, e))
+
+        return config
+
     def fromFiles(self, workflowMetaFilename, securityContextsConfigFilename=None, paranoidMode=False):
-        with open(workflowMetaFilename, mode="r", encoding="utf-8") as wcf:
-            workflow_meta = unmarshall_namedtuple(yaml.load(wcf, Loader=YAMLLoader))
+        workflow_meta = self._readConfigYAML(workflowMetaFilename)
 
         # Last, try loading the security contexts credentials file
         if securityContextsConfigFilename and os.path.exists(securityContextsConfigFilename):
-            with open(securityContextsConfigFilename, mode="r", encoding="utf-8") as scf:
-                creds_config = unmarshall_namedtuple(yaml.load(scf, Loader=YAMLLoader))
+            creds_config = self._readConfigYAML(securityContextsConfigFilename)
         else:
             creds_config = {}
 
@@ -722,8 +929,7 @@ class WF:
         numErrors = 0
         self.logger.info(f'Validating {workflowMetaFilename}')
         
-        with open(workflowMetaFilename, mode="r", encoding="utf-8") as wcf:
-            workflow_meta = unmarshall_namedtuple(yaml.load(wcf, Loader=YAMLLoader))
+        workflow_meta = self._readConfigYAML(workflowMetaFilename)
 
         if not isinstance(workflow_meta, dict):
             workflow_meta = {}
@@ -741,8 +947,7 @@ class WF:
         if securityContextsConfigFilename and os.path.exists(securityContextsConfigFilename):
             self.logger.info(f'Validating {securityContextsConfigFilename}')
             
-            with open(securityContextsConfigFilename, mode="r", encoding="utf-8") as scf:
-                creds_config = unmarshall_namedtuple(yaml.load(scf, Loader=YAMLLoader))
+            creds_config = self._readConfigYAML(securityContextsConfigFilename)
 
             valErrors = self.ConfigValidate(creds_config, self.SECURITY_CONTEXT_SCHEMA)
             if len(valErrors) == 0:
@@ -817,7 +1022,7 @@ class WF:
         and the version will represent either the branch, tag or specific commit.
         So, the whole TRS fetching machinery is bypassed.
         """
-        parsedRepoURL = parse.urlparse(self.id)
+        parsedRepoURL = cached_urlparse(self.id)
 
         # It is not an absolute URL, so it is being an identifier in the workflow
         if parsedRepoURL.scheme == '':
@@ -847,7 +1052,10 @@ class WF:
         repoDir = None
         repoEffectiveCheckout = None
         if ':' in repoURL:
-            parsedRepoURL = parse.urlparse(repoURL)
+            # The workflow id was already parsed on entry, so the URL is
+            # only re-parsed when the guessing stage rewrote it
+            if repoURL != self.id:
+                parsedRepoURL = cached_urlparse(repoURL)
             if len(parsedRepoURL.scheme) > 0:
                 self.repoURL = repoURL
                 self.repoTag = repoTag
@@ -943,9 +1151,9 @@ class WF:
         :param scheme:
         :param handler:
         """
-        if not isinstance(handler, (
-                types.FunctionType, types.LambdaType, types.MethodType, types.BuiltinFunctionType,
-                types.BuiltinMethodType)):
+        # A single callable() check covers every flavour of function,
+        # method or built-in the former isinstance chain enumerated
+        if not callable(handler):
             raise WFException('Trying to set for scheme {} a invalid handler'.format(scheme))
 
         self.cacheHandler.addSchemeHandlers({scheme.lower(): handler})
@@ -1137,6 +1345,10 @@ class WF:
         """
         BEWARE: This is a destructive step! So, once run, there is no back!
         """
+        # Deferred import, so listing or staging working directories
+        # does not pay the cost of loading this dependency
+        import bagit
+
         self.bag = bagit.make_bag(self.workDir)
 
     DefaultCardinality = '1'
@@ -1220,9 +1432,8 @@ class WF:
     
     
     def marshallConfig(self, overwrite : bool = False):
-        workflow_meta_file = os.path.join(self.metaDir, WORKDIR_WORKFLOW_META_FILE)
-        if overwrite or not os.path.exists(workflow_meta_file):
-            with open(workflow_meta_file, mode='w', encoding='utf-8') as wmF:
+        if overwrite or not os.path.exists(self.workflowMetaFilename):
+            with open(self.workflowMetaFilename, mode='w', encoding='utf-8') as wmF:
                 workflow_meta = {
                     'workflow_id': self.id,
                     'paranoid_mode': self.paranoidMode
@@ -1241,23 +1452,21 @@ class WF:
                     outputs = { output.name: output  for output in self.outputs }
                     workflow_meta['outputs'] = outputs
                 
-                yaml.dump(marshall_namedtuple(workflow_meta), wmF, Dumper=YAMLDumper)
+                wmF.write(yaml.dump(marshall_namedtuple(workflow_meta), Dumper=YAMLDumper))
         
-        creds_file = os.path.join(self.metaDir, WORKDIR_SECURITY_CONTEXT_FILE)
-        if overwrite or not os.path.exists(creds_file):
-            with open(creds_file, mode='w', encoding='utf-8') as crF:
-                yaml.dump(marshall_namedtuple(self.creds_config), crF, Dumper=YAMLDumper)
+        if overwrite or not os.path.exists(self.securityContextFilename):
+            with open(self.securityContextFilename, mode='w', encoding='utf-8') as crF:
+                crF.write(yaml.dump(marshall_namedtuple(self.creds_config), Dumper=YAMLDumper))
         
     
     def marshallStage(self, exist_ok : bool = True):
         if not self.stageMarshalled:
             self.marshallConfig(overwrite=False)
             
-            marshalled_stage_file = os.path.join(self.metaDir, WORKDIR_MARSHALLED_STAGE_FILE)
-            if os.path.exists(marshalled_stage_file):
+            if os.path.exists(self.marshalledStageFilename):
                 if not exist_ok:
                     raise WFException("Marshalled stage file already exists")
-                self.logger.debug("Marshalled stage file {} already exists".format(marshalled_stage_file))
+                self.logger.debug("Marshalled stage file {} already exists".format(self.marshalledStageFilename))
             else:
                 stage = {
                     'repoURL': self.repoURL,
@@ -1272,10 +1481,10 @@ class WF:
                     # TODO: check nothing essential was left
                 }
                 
-                self.logger.debug("Creating marshalled stage file {}".format(marshalled_stage_file))
-                with open(marshalled_stage_file, mode='w', encoding='utf-8') as msF:
+                self.logger.debug("Creating marshalled stage file {}".format(self.marshalledStageFilename))
+                with open(self.marshalledStageFilename, mode='w', encoding='utf-8') as msF:
                     marshalled_stage = marshall_namedtuple(stage)
-                    yaml.dump(marshalled_stage, msF, Dumper=YAMLDumper)
+                    msF.write(yaml.dump(marshalled_stage, Dumper=YAMLDumper))
             
             self.stageMarshalled = True
         elif not exist_ok:
@@ -1283,12 +1492,11 @@ class WF:
     
     def unmarshallStage(self, offline : bool = False):
         if not self.stageMarshalled:
-            marshalled_stage_file = os.path.join(self.metaDir, WORKDIR_MARSHALLED_STAGE_FILE)
-            if not os.path.exists(marshalled_stage_file):
+            if not os.path.exists(self.marshalledStageFilename):
                 raise WFException("Marshalled stage file does not exists. Stage state was not stored")
             
-            self.logger.debug("Parsing marshalled stage state file {}".format(marshalled_stage_file))
-            with open(marshalled_stage_file, mode='r', encoding='utf-8') as msF:
+            self.logger.debug("Parsing marshalled stage state file {}".format(self.marshalledStageFilename))
+            with open(self.marshalledStageFilename, mode='r', encoding='utf-8') as msF:
                 marshalled_stage = yaml.load(msF, Loader=YAMLLoader)
                 try:
                     stage = unmarshall_namedtuple(marshalled_stage, globals())
@@ -1305,7 +1513,7 @@ class WF:
                     # This is needed to properly set up the materializedEngine
                     self.setupEngine(offline=True)
                 except Exception as e:
-                    raise WFException("Error while unmarshalling content from stage state file {}. Reason: {}".format(marshalled_stage_file,e))
+                    raise WFException("Error while unmarshalling content from stage state file {}. Reason: {}".format(self.marshalledStageFilename,e))
             
             self.stageMarshalled = True
     
@@ -1313,11 +1521,10 @@ class WF:
         if not self.executionMarshalled:
             self.marshallStage(exist_ok=exist_ok)
             
-            marshalled_execution_file = os.path.join(self.metaDir, WORKDIR_MARSHALLED_EXECUTE_FILE)
-            if os.path.exists(marshalled_execution_file):
+            if os.path.exists(self.marshalledExecuteFilename):
                 if not exist_ok:
                     raise WFException("Marshalled execution file already exists")
-                self.logger.debug("Marshalled execution file {} already exists".format(marshalled_execution_file))
+                self.logger.debug("Marshalled execution file {} already exists".format(self.marshalledExecuteFilename))
             else:
                 execution = {
                     'exitVal': self.exitVal,
@@ -1326,9 +1533,9 @@ class WF:
                     # TODO: check nothing essential was left
                 }
                 
-                self.logger.debug("Creating marshalled execution file {}".format(marshalled_execution_file))
-                with open(marshalled_execution_file, mode='w', encoding='utf-8') as msF:
-                    yaml.dump(marshall_namedtuple(execution), msF, Dumper=YAMLDumper)
+                self.logger.debug("Creating marshalled execution file {}".format(self.marshalledExecuteFilename))
+                with open(self.marshalledExecuteFilename, mode='w', encoding='utf-8') as msF:
+                    msF.write(yaml.dump(marshall_namedtuple(execution), Dumper=YAMLDumper))
             
             self.executionMarshalled = True
         elif not exist_ok:
@@ -1337,12 +1544,11 @@ class WF:
     def unmarshallExecute(self, offline : bool = True):
         if not self.executionMarshalled:
             self.unmarshallStage(offline=offline)
-            marshalled_execution_file = os.path.join(self.metaDir, WORKDIR_MARSHALLED_EXECUTE_FILE)
-            if not os.path.exists(marshalled_execution_file):
+            if not os.path.exists(self.marshalledExecuteFilename):
                 raise WFException("Marshalled execution file does not exists. Execution state was not stored")
             
-            self.logger.debug("Parsing marshalled execution state file {}".format(marshalled_execution_file))
-            with open(marshalled_execution_file, mode='r', encoding='utf-8') as meF:
+            self.logger.debug("Parsing marshalled execution state file {}".format(self.marshalledExecuteFilename))
+            with open(self.marshalledExecuteFilename, mode='r', encoding='utf-8') as meF:
                 marshalled_execution = yaml.load(meF, Loader=YAMLLoader)
                 try:
                     execution = unmarshall_namedtuple(marshalled_execution, globals())
@@ -1351,7 +1557,7 @@ class WF:
                     self.augmentedInputs = execution['augmentedInputs']
                     self.matCheckOutputs = execution['matCheckOutputs']
                 except Exception as e:
-                    raise WFException("Error while unmarshalling content from execution state file {}. Reason: {}".format(marshalled_execution_file, e))
+                    raise WFException("Error while unmarshalling content from execution state file {}. Reason: {}".format(self.marshalledExecuteFilename, e))
             
             self.executionMarshalled = True
     
@@ -1359,19 +1565,18 @@ class WF:
         if not self.exportMarshalled:
             self.marshallExecute(exist_ok=exist_ok)
             
-            marshalled_export_file = os.path.join(self.metaDir, WORKDIR_MARSHALLED_EXPORT_FILE)
-            if os.path.exists(marshalled_export_file):
+            if os.path.exists(self.marshalledExportFilename):
                 if not exist_ok:
                     raise WFException("Marshalled export results file already exists")
-                self.logger.debug("Marshalled export results file {} already exists".format(marshalled_export_file))
+                self.logger.debug("Marshalled export results file {} already exists".format(self.marshalledExportFilename))
             else:
                 exported_results = {
                     # TODO
                 }
                 
-                self.logger.debug("Creating marshalled export results file {}".format(marshalled_export_file))
-                with open(marshalled_export_file, mode='w', encoding='utf-8') as msF:
-                    yaml.dump(marshall_namedtuple(exported_results), msF, Dumper=YAMLDumper)
+                self.logger.debug("Creating marshalled export results file {}".format(self.marshalledExportFilename))
+                with open(self.marshalledExportFilename, mode='w', encoding='utf-8') as msF:
+                    msF.write(yaml.dump(marshall_namedtuple(exported_results), Dumper=YAMLDumper))
             
             self.exportMarshalled = True
         elif not exist_ok:
@@ -1380,19 +1585,18 @@ class WF:
     def unmarshallExport(self, offline : bool = True):
         if not self.exportMarshalled:
             self.unmarshallExecute(offline=offline)
-            marshalled_export_file = os.path.join(self.metaDir, WORKDIR_MARSHALLED_EXPORT_FILE)
-            if not os.path.exists(marshalled_export_file):
+            if not os.path.exists(self.marshalledExportFilename):
                 raise WFException("Marshalled export results file does not exists. Export results state was not stored")
             
-            self.logger.debug("Parsing marshalled export results state file {}".format(marshalled_export_file))
-            with open(marshalled_export_file, mode='r', encoding='utf-8') as meF:
+            self.logger.debug("Parsing marshalled export results state file {}".format(self.marshalledExportFilename))
+            with open(self.marshalledExportFilename, mode='r', encoding='utf-8') as meF:
                 marshalled_export = yaml.load(meF, Loader=YAMLLoader)
                 try:
                     exported_results = unmarshall_namedtuple(marshalled_export, globals())
                     
                     # TODO
                 except Exception as e:
-                    raise WFException(f"Error while unmarshalling content from export results state file {marshalled_export_file}. Reason: {e}")
+                    raise WFException(f"Error while unmarshalling content from export results state file {self.marshalledExportFilename}. Reason: {e}")
             
             self.exportMarshalled = True
     
@@ -1422,7 +1626,7 @@ class WF:
 
         # Create RO-crate using crate.zip downloaded from WorkflowHub
         if os.path.isfile(str(self.cacheROCrateFilename)):
-            wfCrate = rocrate.ROCrate(self.cacheROCrateFilename)
+            wfCrate = self.parseROCrate(self.cacheROCrateFilename)
 
         # Create RO-Crate using rocrate_api
         # TODO no exists the version implemented for Nextflow in rocrate_api
@@ -1437,7 +1641,7 @@ class WF:
 
             # TODO create method to create wf_url
             matWf = self.materializedEngine.workflow
-            parsed_repo_url = parse.urlparse(self.repoURL)
+            parsed_repo_url = cached_urlparse(self.repoURL)
             if parsed_repo_url.netloc == 'github.com':
                 parsed_repo_path = parsed_repo_url.path.split('/')
                 repo_name = parsed_repo_path[2]
@@ -1458,9 +1662,10 @@ class WF:
             # TODO assign something meaningful to cwl
             cwl = True
 
-            workflow_path = Path(wf_path)
+            # Plain os.path calls avoid materializing Path objects just
+            # to take the basename back out of them
             wf_file = wfCrate.add_workflow(
-                str(workflow_path), workflow_path.name, fetch_remote=False,
+                wf_path, os.path.basename(wf_path), fetch_remote=False,
                 main=True, lang=compLang, gen_cwl=(cwl is None)
             )
             # This is needed, as it is not automatically added when the
@@ -1470,8 +1675,12 @@ class WF:
             # if the source is a remote URL then add https://schema.org/codeRepository
             # property to it this can be checked by checking if the source is a URL
             # instead of a local path
-            wf_file.properties()['url'] = wf_entrypoint_url
-            wf_file.properties()['codeRepository'] = wf_url
+            # Both properties are set through a single lookup of the
+            # underlying JSON-LD dictionary
+            wf_file.properties().update({
+                'url': wf_entrypoint_url,
+                'codeRepository': wf_url,
+            })
             # if 'url' in wf_file.properties():
             #    wf_file['codeRepository'] = wf_file['url']
 
@@ -1567,9 +1776,12 @@ class WF:
         doRepoUpdate = True
         if not os.path.exists(repo_tag_destdir):
             # Try cloning the repository without initial checkout
+            # Blobless clones defer fetching file contents until checkout,
+            # which hugely reduces transferred bytes and .git size on
+            # repositories with a long history
             if repoTag is not None:
                 gitclone_params = [
-                    self.git_cmd, 'clone', '-n', '--recurse-submodules', repoURL, repo_tag_destdir
+                    self.git_cmd, 'clone', '-n', '--filter=blob:none', '--recurse-submodules', repoURL, repo_tag_destdir
                 ]
 
                 # Now, checkout the specific commit
@@ -1579,7 +1791,7 @@ class WF:
             else:
                 # We know nothing about the tag, or checkout
                 gitclone_params = [
-                    self.git_cmd, 'clone', '--recurse-submodules', repoURL, repo_tag_destdir
+                    self.git_cmd, 'clone', '--filter=blob:none', '--recurse-submodules', repoURL, repo_tag_destdir
                 ]
 
                 gitcheckout_params = None
@@ -1642,44 +1854,46 @@ class WF:
 
         :return:
         """
-        # Now, time to check whether it is a TRSv2
-        trs_endpoint_v2_meta = self.trs_endpoint + 'service-info'
-        trs_endpoint_v2_beta2_meta = self.trs_endpoint + 'metadata'
-        trs_endpoint_meta = None
-        
-        # Needed to store this metadata
-        trsMetadataCache = os.path.join(self.metaDir, self.TRS_METADATA_FILE)
-        
-        try:
-            metaContentKind , cachedTRSMetaFile , trsMetaMeta = self.cacheHandler.fetch(trs_endpoint_v2_meta, self.metaDir, offline)
-            trs_endpoint_meta = trs_endpoint_v2_meta
-        except WFException as wfe:
+        # The endpoint probe answer is kept, so further calls within
+        # the lifetime of this instance skip both fetches
+        if self.trs_endpoint_meta is None:
+            # Now, time to check whether it is a TRSv2
+            trs_endpoint_v2_meta = self.trs_endpoint + 'service-info'
+            trs_endpoint_v2_beta2_meta = self.trs_endpoint + 'metadata'
+            trs_endpoint_meta = None
+
+            # Needed to store this metadata
+            trsMetadataCache = os.path.join(self.metaDir, self.TRS_METADATA_FILE)
+
             try:
-                metaContentKind , cachedTRSMetaFile , trsMetaMeta = self.cacheHandler.fetch(trs_endpoint_v2_beta2_meta, self.metaDir, offline)
-                trs_endpoint_meta = trs_endpoint_v2_beta2_meta
-            except WFException as wfebeta:
-                raise WFException("Unable to fetch metadata from {} in order to identify whether it is a working GA4GH TRSv2 endpoint. Exceptions:\n{}\n{}".format(self.trs_endpoint, wfe, wfebeta))
-        
-        # Giving a friendly name
-        if not os.path.exists(trsMetadataCache):
-            os.symlink(os.path.basename(cachedTRSMetaFile), trsMetadataCache)
-        
-        with open(trsMetadataCache, mode="r", encoding="utf-8") as ctmf:
-            self.trs_endpoint_meta = json.load(ctmf)
-        
-        # Minimal check
-        trs_version = self.trs_endpoint_meta.get('api_version')
-        if trs_version is None:
-            trs_version = self.trs_endpoint_meta.get('type', {}).get('version')
-        
-        if trs_version is None:
-            raise WFException("Unable to identify TRS version from {}".format(trs_endpoint_meta))
-        
-        # Now, check the tool does exist in the TRS, and the version
-        trs_tools_url = parse.urljoin(self.trs_endpoint, self.TRS_TOOLS_PATH + parse.quote(self.id, safe=''))
+                metaContentKind , cachedTRSMetaFile , trsMetaMeta = self.cacheHandler.fetch(trs_endpoint_v2_meta, self.metaDir, offline)
+                trs_endpoint_meta = trs_endpoint_v2_meta
+            except WFException as wfe:
+                try:
+                    metaContentKind , cachedTRSMetaFile , trsMetaMeta = self.cacheHandler.fetch(trs_endpoint_v2_beta2_meta, self.metaDir, offline)
+                    trs_endpoint_meta = trs_endpoint_v2_beta2_meta
+                except WFException as wfebeta:
+                    raise WFException("Unable to fetch metadata from {} in order to identify whether it is a working GA4GH TRSv2 endpoint. Exceptions:\n{}\n{}".format(self.trs_endpoint, wfe, wfebeta))
+
+            # Giving a friendly name
+            if not os.path.exists(trsMetadataCache):
+                os.symlink(os.path.basename(cachedTRSMetaFile), trsMetadataCache)
+
+            with open(trsMetadataCache, mode="r", encoding="utf-8") as ctmf:
+                self.trs_endpoint_meta = json.loads(ctmf.read())
 
+            # Minimal check
+            trs_version = self.trs_endpoint_meta.get('api_version')
+            if trs_version is None:
+                trs_version = self.trs_endpoint_meta.get('type', {}).get('version')
+
+            if trs_version is None:
+                self.trs_endpoint_meta = None
+                raise WFException("Unable to identify TRS version from {}".format(trs_endpoint_meta))
+
+        # Now, check the tool does exist in the TRS, and the version
         trsQueryCache = os.path.join(self.metaDir, self.TRS_QUERY_CACHE_FILE)
-        _ , cachedTRSQueryFile , _ = self.cacheHandler.fetch(trs_tools_url, self.metaDir, offline)
+        _ , cachedTRSQueryFile , _ = self.cacheHandler.fetch(self.trs_tools_url, self.metaDir, offline)
         # Giving a friendly name
         if not os.path.exists(trsQueryCache):
             os.symlink(os.path.basename(cachedTRSQueryFile), trsQueryCache)
@@ -1758,13 +1972,14 @@ class WF:
                 'Descriptor type {} is not among the acknowledged ones by this backend. Version {} of workflow {} from {} . Raw answer:\n{}'.format(
                     self.descriptor_type, self.version_id, self.id, self.trs_endpoint, rawToolDesc))
         
-        toolFilesURL = trs_tools_url + '/versions/' + parse.quote(toolVersionId, safe='') + '/' + parse.quote(chosenDescriptorType, safe='') + '/files'
+        toolFilesURL = self.trs_tools_url + '/versions/' + parse.quote(toolVersionId, safe='') + '/' + parse.quote(chosenDescriptorType, safe='') + '/files'
         
         # Detecting whether RO-Crate trick will work
         if self.trs_endpoint_meta.get('organization',{}).get('name') == 'WorkflowHub':
             self.logger.debug("WorkflowHub workflow")
             # And this is the moment where the RO-Crate must be fetched
-            roCrateURL = toolFilesURL + '?' + parse.urlencode({'format': 'zip'})
+            # The query string is constant, so urlencode is not needed
+            roCrateURL = toolFilesURL + '?format=zip'
 
             return self.getWorkflowRepoFromROCrateURL(roCrateURL,
                                                    expectedEngineDesc=self.RECOGNIZED_TRS_DESCRIPTORS[
@@ -1782,17 +1997,17 @@ class WF:
                 repoURL, repoTag, repoRelPath = self.guessRepoParams(remote_workflow_entrypoint, fail_ok=False)
                 
                 if repoURL is not None:
-                    self.logger.debug("Derived repository {} ({} , rel {}) from {}".format(repoURL, repoTag, repoRelPath, trs_tools_url))
+                    self.logger.debug("Derived repository {} ({} , rel {}) from {}".format(repoURL, repoTag, repoRelPath, self.trs_tools_url))
                     return expectedEngineDesc , repoURL, repoTag, repoRelPath
             
             workflow_entrypoint = trsFilesMeta[0].metadata.get('workflow_entrypoint')
             if workflow_entrypoint is not None:
-                self.logger.debug("Using raw files from TRS tool {}".format(trs_tools_url))
+                self.logger.debug("Using raw files from TRS tool {}".format(self.trs_tools_url))
                 repoDir = trsFilesDir
                 repoRelPath = workflow_entrypoint
                 return expectedEngineDesc , repoDir, None, repoRelPath
                 
-        raise WFException("Unable to find a workflow in {}".format(trs_tools_url))
+        raise WFException("Unable to find a workflow in {}".format(self.trs_tools_url))
 
     def getWorkflowRepoFromROCrateURL(self, roCrateURL, expectedEngineDesc: WorkflowType = None, offline: bool = False) -> Tuple[WorkflowType, RepoURL, RepoTag, RelPath]:
         """
@@ -1806,6 +2021,25 @@ class WF:
         
         return self.getWorkflowRepoFromROCrateFile(roCrateFile, expectedEngineDesc)
         
+    def parseROCrate(self, roCrateFile: AbsPath):
+        """
+        Parse an RO-Crate file, reusing the in-memory instance when the
+        very same file was already digested in this session
+
+        :param roCrateFile:
+        :return: an instance of rocrate.ROCrate
+        """
+        roCrateObj = self.parsedROCrateCache.get(roCrateFile)
+        if roCrateObj is None:
+            # Deferred import, as the rocrate dependency tree is heavy
+            # and not all the operations need it
+            from rocrate import rocrate
+
+            roCrateObj = rocrate.ROCrate(roCrateFile)
+            self.parsedROCrateCache[roCrateFile] = roCrateObj
+
+        return roCrateObj
+
     def getWorkflowRepoFromROCrateFile(self, roCrateFile: AbsPath, expectedEngineDesc: WorkflowType = None) -> Tuple[WorkflowType, RepoURL, RepoTag, RelPath]:
         """
 
@@ -1813,7 +2047,7 @@ class WF:
         :param expectedEngineDesc: If defined, an instance of WorkflowType
         :return:
         """
-        roCrateObj = rocrate.ROCrate(roCrateFile)
+        roCrateObj = self.parseROCrate(roCrateFile)
 
         # TODO: get roCrateObj mainEntity programming language
         # self.logger.debug(roCrateObj.root_dataset.as_jsonld())
@@ -1902,11 +2136,11 @@ class WF:
         if isinstance(wf_url, parse.ParseResult):
             parsed_wf_url = wf_url
         else:
-            parsed_wf_url = parse.urlparse(wf_url)
+            parsed_wf_url = cached_urlparse(wf_url)
         
         # These are the usual URIs which can be understood by pip
         # See https://pip.pypa.io/en/stable/cli/pip_install/#git
-        if parsed_wf_url.scheme.startswith('git+') or parsed_wf_url.scheme == 'git':
+        if GIT_SCHEME_PATTERN.match(parsed_wf_url.scheme):
             # Getting the scheme git is going to understand
             if len(parsed_wf_url.scheme) > 3:
                 gitScheme = parsed_wf_url.scheme[4:]
@@ -1929,49 +2163,76 @@ class WF:
             # Now, reassemble the repoURL
             repoURL = parse.urlunparse((gitScheme, parsed_wf_url.netloc, gitPath, '', '', ''))
             
-        # TODO handling other popular cases, like bitbucket
-        elif parsed_wf_url.netloc == 'github.com':
-            wf_path = parsed_wf_url.path.split('/')
-
-            if len(wf_path) >= 3:
-                repoGitPath = wf_path[:3]
-                if not repoGitPath[-1].endswith('.git'):
-                    repoGitPath[-1] += '.git'
-
-                # Rebuilding repo git path
-                repoURL = parse.urlunparse(
-                    (parsed_wf_url.scheme, parsed_wf_url.netloc, '/'.join(repoGitPath), '', '', ''))
-
-                # And now, guessing the tag and the relative path
-                if len(wf_path) >= 5 and (wf_path[3] in ('blob', 'tree')):
-                    repoTag = wf_path[4]
-
-                    if len(wf_path) >= 6:
-                        repoRelPath = '/'.join(wf_path[5:])
-        elif parsed_wf_url.netloc == 'raw.githubusercontent.com':
-            wf_path = parsed_wf_url.path.split('/')
-            if len(wf_path) >= 3:
-                # Rebuilding it
-                repoGitPath = wf_path[:3]
+        else:
+            # TODO handling other popular cases, like bitbucket
+            hostGuesser = self.HOSTED_REPO_GUESSERS.get(parsed_wf_url.netloc)
+            if hostGuesser is not None:
+                repoURL , repoTag , repoRelPath = hostGuesser(self, parsed_wf_url)
+            elif fail_ok:
+                raise WFException("FIXME: Unsupported http(s) git repository {}".format(wf_url))
+
+        self.logger.debug("From {} was derived {} {} {}".format(wf_url, repoURL, repoTag, repoRelPath))
+
+        return repoURL, repoTag, repoRelPath
+
+    def _guessGitHubRepoParams(self, parsed_wf_url: parse.ParseResult) -> Tuple[RepoURL, RepoTag, RelPath]:
+        repoURL = None
+        repoTag = None
+        repoRelPath = None
+
+        # The path is tokenized once, and reused along the branch
+        wf_path = parsed_wf_url.path.split('/')
+
+        if len(wf_path) >= 3:
+            repoGitPath = wf_path[:3]
+            if not repoGitPath[-1].endswith('.git'):
                 repoGitPath[-1] += '.git'
 
-                # Rebuilding repo git path
-                repoURL = parse.urlunparse(
-                    ('https', 'github.com', '/'.join(repoGitPath), '', '', ''))
+            # Rebuilding repo git path
+            repoURL = parse.urlunparse(
+                (parsed_wf_url.scheme, parsed_wf_url.netloc, '/'.join(repoGitPath), '', '', ''))
 
-                # And now, guessing the tag/checkout and the relative path
-                if len(wf_path) >= 4:
-                    repoTag = wf_path[3]
+            # And now, guessing the tag and the relative path
+            if len(wf_path) >= 5 and (wf_path[3] in ('blob', 'tree')):
+                repoTag = wf_path[4]
 
-                    if len(wf_path) >= 5:
-                        repoRelPath = '/'.join(wf_path[4:])
-        elif fail_ok:
-            raise WFException("FIXME: Unsupported http(s) git repository {}".format(wf_url))
+                if len(wf_path) >= 6:
+                    repoRelPath = '/'.join(wf_path[5:])
 
-        self.logger.debug("From {} was derived {} {} {}".format(wf_url, repoURL, repoTag, repoRelPath))
+        return repoURL, repoTag, repoRelPath
+
+    def _guessRawGitHubRepoParams(self, parsed_wf_url: parse.ParseResult) -> Tuple[RepoURL, RepoTag, RelPath]:
+        repoURL = None
+        repoTag = None
+        repoRelPath = None
+
+        wf_path = parsed_wf_url.path.split('/')
+        if len(wf_path) >= 3:
+            # Rebuilding it
+            repoGitPath = wf_path[:3]
+            repoGitPath[-1] += '.git'
+
+            # Rebuilding repo git path
+            repoURL = parse.urlunparse(
+                ('https', 'github.com', '/'.join(repoGitPath), '', '', ''))
+
+            # And now, guessing the tag/checkout and the relative path
+            if len(wf_path) >= 4:
+                repoTag = wf_path[3]
+
+                if len(wf_path) >= 5:
+                    repoRelPath = '/'.join(wf_path[4:])
 
         return repoURL, repoTag, repoRelPath
 
+    # Maps recognized hosting netlocs to the method guessing their
+    # repo coordinates, so a single dict lookup replaces the previous
+    # per-host comparison chain and new forges only register here
+    HOSTED_REPO_GUESSERS = {
+        'github.com': _guessGitHubRepoParams,
+        'raw.githubusercontent.com': _guessRawGitHubRepoParams,
+    }
+
     def downloadROcrate(self, roCrateURL, offline: bool = False) -> AbsPath:
         """
         Download RO-crate from WorkflowHub (https://dev.workflowhub.eu/)
@@ -2009,13 +2270,13 @@ class WF:
         :param offline:
         :type remote_file: str
         """
-        parsedInputURL = parse.urlparse(remote_file)
+        parsedInputURL = cached_urlparse(remote_file)
 
         if not all([parsedInputURL.scheme, parsedInputURL.path]):
             raise RuntimeError("Input is not a valid remote URL or CURIE source")
 
         else:
-            prettyFilename = parsedInputURL.path.split('/')[-1]
+            prettyFilename = posixpath.basename(parsedInputURL.path)
 
             # Assure workflow inputs directory exists before the next step
             if workflowInputs_destdir is None: